@@ -1,7 +1,12 @@
-from typing import NamedTuple, Optional, List, Dict, Union, Any
+from operator import attrgetter
+from typing import Optional, List, Dict, Union, Any
 
+import attr
+from attr import attrs
 
-class Document(NamedTuple):
+
+@attrs(frozen=True, slots=True, auto_attribs=True, kw_only=True)
+class Document:
     filename: str
     url: str
     url_origin: str
@@ -11,89 +16,46 @@ class Document(NamedTuple):
     time_modified: Optional[str]
     time_retrieved: Optional[str]
     title: str
-    authors: Optional[List[str]]
-    paragraphs: List[str]
+    authors: Optional[List[str]] = None
+    paragraphs: List[str] = attr.Factory(list)
     n_paragraphs: int
     n_chars: int
-    parallel_article: Optional[str]
+    parallel_article: Optional[str] = None
     cld3_detected_languages: Dict[str, Dict[str, Union[float, str]]]
     predicted_language: str
-    sentences: Optional[List[List[str]]]
-    tokens: Optional[List[List[List[str]]]]
-    n_tokens: Optional[int]
-    n_sentences: Optional[int]
-    keywords: List[str]
-    section: Optional[str]
+    sentences: Optional[List[List[str]]] = None
+    tokens: Optional[List[List[List[str]]]] = None
+    n_tokens: Optional[int] = None
+    n_sentences: Optional[int] = None
+    keywords: List[str] = attr.Factory(list)
+    section: Optional[str] = None
 
     def to_dict(self):
-        dictionary = self._asdict()
-        for field in (
-            "parallel_article",
-            "sentences",
-            "tokens",
-            "n_tokens",
-            "n_sentences",
-        ):
-            if not dictionary[field]:
-                del dictionary[field]
-        return dictionary
+        # Optional fields are left out of the output entirely when empty
+        return {
+            name: value
+            for name, value in zip(_FIELD_NAMES, _field_values(self))
+            if value or name not in _OMIT_IF_EMPTY
+        }
 
     def update_filename(self, new_filename: str) -> "Document":
         """
         Updates the filename on an existing document.
         """
-        # If we ever need to update more, consider using builder instead of this method
-        return Document(
-            filename=new_filename,
-            url=self.url,
-            url_origin=self.url_origin,
-            content_type=self.content_type,
-            site_language=self.site_language,
-            time_published=self.time_published,
-            time_modified=self.time_modified,
-            time_retrieved=self.time_retrieved,
-            title=self.title,
-            authors=self.authors,
-            paragraphs=self.paragraphs,
-            n_paragraphs=self.n_paragraphs,
-            n_chars=self.n_chars,
-            parallel_article=self.parallel_article,
-            cld3_detected_languages=self.cld3_detected_languages,
-            predicted_language=self.predicted_language,
-            sentences=self.sentences,
-            tokens=self.tokens,
-            n_tokens=self.n_tokens,
-            n_sentences=self.n_sentences,
-            keywords=self.keywords,
-            section=self.section,
-        )
+        return attr.evolve(self, filename=new_filename)
 
     @classmethod
     def from_dict(cls, d: Dict[Any, Any]) -> "Document":
         """
-        Convert json dictionary into a Document object
+        Convert json dictionary into a Document object.
+        Fields missing from the dictionary fall back to their defaults, if they have one.
         """
-        return Document(
-            filename=d["filename"],
-            url=d["url"],
-            url_origin=d["url_origin"],
-            content_type=d["content_type"],
-            site_language=d["site_language"],
-            time_published=d["time_published"],
-            time_modified=d["time_modified"],
-            time_retrieved=d["time_retrieved"],
-            title=d["title"],
-            authors=d.get("authors", None),
-            paragraphs=d.get("paragraphs", []),
-            n_paragraphs=d["n_paragraphs"],
-            n_chars=d["n_chars"],
-            parallel_article=d.get("parallel_article", None),
-            cld3_detected_languages=d["cld3_detected_languages"],
-            predicted_language=d["predicted_language"],
-            sentences=d.get("sentences", None),
-            tokens=d.get("tokens", None),
-            n_tokens=d.get("n_tokens"),
-            n_sentences=d.get("n_sentences"),
-            keywords=d.get("keywords", []),
-            section=d.get("section", None),
-        )
+        return cls(**{name: d[name] for name in _FIELD_NAMES if name in d})
+
+
+_FIELD_NAMES = tuple(field.name for field in attr.fields(Document))
+# Fetches every field value as a tuple in a single C-level call
+_field_values = attrgetter(*_FIELD_NAMES)
+_OMIT_IF_EMPTY = frozenset(
+    {"parallel_article", "sentences", "tokens", "n_tokens", "n_sentences"}
+)
@@ -3,17 +3,34 @@
 Script to go through all the VOA sites and get sitemaps and extract
 from them additional sitemaps.
 """
+import csv
 import gzip
 import os
 import re
 import shutil
 from argparse import ArgumentParser
 from os.path import basename
-from typing import List, Optional, Generator, Iterable, Dict
-from urllib import request
-import wget
+from typing import BinaryIO, List, Optional, Generator, Iterable, Dict, Match, Union
+
+import urllib3
 from attr import attrs
-from lxml import etree, objectify
+from lxml import etree
+
+# Protocol prefixes to drop, then characters and whitespace runs to replace with "_"
+SANITIZE_URL_REGEX = re.compile(r"(https://www\.|http://www\.|https://)|[?,=/]|\s+")
+
+# Buffer the filemap so its many short rows are written in large blocks
+FILEMAP_BUFFER_SIZE = 1 << 20
+# Number of filemap rows collected before they are handed to writelines together
+FILEMAP_ROWS_PER_WRITE = 1000
+# Sitemaps are downloaded to a file with this suffix and renamed once complete, so an
+# interrupted download never looks like a finished one
+PARTIAL_DOWNLOAD_SUFFIX = ".part"
+# Gzipped sitemaps are kept compressed on disk under their filemap name plus this suffix
+GZIP_SUFFIX = ".gz"
+
+# Shared across all requests so connections to each VOA host are kept alive
+_POOL = urllib3.PoolManager(maxsize=16, retries=urllib3.Retry(3))
 
 
 @attrs(frozen=True, auto_attribs=True)
@@ -87,13 +104,13 @@ def read_voa_domains(domain_tsv_path: str) -> List[Domain]:
     This currently assumes regions are specified in the line above all the entries.
     """
     domains = []
-    with open(domain_tsv_path, "r", encoding="utf8") as domain_file:
+    with open(domain_tsv_path, "r", encoding="utf8", newline="") as domain_file:
+        # Fields are never quoted, so quote characters are read as-is
+        reader = csv.reader(domain_file, delimiter="\t", quoting=csv.QUOTE_NONE)
+        # Skip the header
+        next(reader)
         region = None
-        for i, line in enumerate(domain_file):
-            if i == 0:
-                # Skip the header
-                continue
-            fields = line.split("\t")
+        for fields in reader:
             fields = clean_fields(fields)
             if fields[0]:
                 region = fields[0]
@@ -122,70 +139,91 @@ def find_sitemaps(domains: List[Domain]) -> Generator[Sitemap, None, None]:
         if category:
             appended_url = category + "/sitemap.xml"
             try:
-                weburl = request.urlopen(appended_url)
+                weburl = _POOL.request("GET", appended_url, preload_content=False)
             # Bare exception, bad practice but not sure what exceptions might show up
             except Exception as e:
                 print(e, appended_url)
-
-            weburl_content = weburl.read()
-            if not weburl or not weburl_content:
-                print(f"Warning appended_url: {appended_url} has no content to parse")
                 continue
-            sitemap_tree = etree.XML(weburl_content)
-            objectify.deannotate(sitemap_tree, cleanup_namespaces=True)
-            # Find the url and the timestamp
-            for sitemap in sitemap_tree:
-                timestamp = None
-                sitemap_url = None
-                for tag in sitemap:
-                    if tag.text.endswith("Hreflang"):
-                        # Appears to not contain anything
+            if weburl.status != 200:
+                print(f"Warning appended_url: {appended_url} returned {weburl.status}")
+                weburl.drain_conn()
+                weburl.release_conn()
+                continue
+
+            # Stream the sitemap index so only one <sitemap> element is in memory at a time
+            try:
+                for _, sitemap in etree.iterparse(
+                    weburl, events=("end",), tag="{*}sitemap"
+                ):
+                    # Find the url and the timestamp
+                    timestamp = None
+                    sitemap_url = None
+                    for tag in sitemap:
+                        if tag.text.endswith("Hreflang"):
+                            # Appears to not contain anything
+                            continue
+                        # Tag name without its namespace, whichever namespace the
+                        # index uses, without building a QName for each child
+                        localname = tag.tag.rpartition("}")[2]
+                        if localname == "loc":
+                            sitemap_url = tag.text
+                        elif localname == "lastmod":
+                            timestamp = tag.text
+                    # Free the finished element and any earlier siblings
+                    sitemap.clear()
+                    while sitemap.getprevious() is not None:
+                        del sitemap.getparent()[0]
+                    if not sitemap_url:
                         continue
-                    if etree.QName(tag).localname == "loc":
-                        sitemap_url = tag.text
-                    elif etree.QName(tag).localname == "lastmod":
-                        timestamp = tag.text
-                if not sitemap_url:
-                    continue
-
-                yield Sitemap(
-                    sitemap_url,
-                    domain.iso,
-                    domain.language,
-                    domain.site_name,
-                    timestamp,
-                    domain.region,
-                )
 
+                    yield Sitemap(
+                        sitemap_url,
+                        domain.iso,
+                        domain.language,
+                        domain.site_name,
+                        timestamp,
+                        domain.region,
+                    )
+            except etree.XMLSyntaxError as e:
+                print(f"Warning appended_url: {appended_url} could not be parsed. {e}")
+            finally:
+                weburl.drain_conn()
+                weburl.release_conn()
+
+
+def download(url: str, outfile: BinaryIO) -> None:
+    """Download a url into an open binary file, reusing pooled connections."""
+    response = _POOL.request("GET", url, preload_content=False)
+    try:
+        if response.status != 200:
+            raise ValueError(f"Got status {response.status} downloading {url}")
+        shutil.copyfileobj(response, outfile)
+    finally:
+        response.drain_conn()
+        response.release_conn()
 
-def gunzip(filepath: str) -> str:
+
+def open_sitemap(path: str) -> Union[gzip.GzipFile, BinaryIO]:
     """
-    Uncompress a gzip file.
+    Open a downloaded sitemap for reading, given its path from the filemap.
+    Gzipped sitemaps are read from the file with a .gz suffix next to that path, and
+    decompressed on the fly.
     """
-    if filepath.endswith(".gz"):
-        with gzip.open(filepath, "rb") as f_in:
-            with open(filepath.rstrip(".gz"), "wb") as f_out:
-                shutil.copyfileobj(f_in, f_out)
-            os.remove(filepath)
-        return filepath.rstrip(".gz")
+    gzip_path = path + GZIP_SUFFIX
+    if os.path.exists(gzip_path):
+        return gzip.open(gzip_path, "rb")
     else:
-        raise ValueError(
-            "This file shouldn't be gunzipped since the extension isn't .gz"
-        )
+        return open(path, "rb")
 
 
 def sanitize_url(url: str) -> str:
     """Remove parts of url string we don't want or can't use as a filename"""
-    base = (
-        url.replace("?", "_")
-        .replace(",", "_")
-        .replace("=", "_")
-        .replace("https://www.", "")
-        .replace("http://www.", "")
-        .replace("https://", "")
-        .replace("/", "_")
-    )
-    return re.sub(r"\s+", "_", base)
+    return SANITIZE_URL_REGEX.sub(_sanitize_replacement, url)
+
+
+def _sanitize_replacement(match: Match) -> str:
+    # Protocol prefixes are dropped, everything else becomes an underscore
+    return "" if match.group(1) else "_"
 
 
 def dump_sitemaps(filemap_path: str, sitemaps: Iterable[Sitemap], outdir: str) -> None:
@@ -195,7 +233,9 @@ def dump_sitemaps(filemap_path: str, sitemaps: Iterable[Sitemap], outdir: str) -
     timestamp etc.
     """
     filename_set = set()
-    with open(filemap_path, "w", encoding="utf8") as filemap_out:
+    with open(
+        filemap_path, "w", encoding="utf8", buffering=FILEMAP_BUFFER_SIZE
+    ) as filemap_out:
         # Write header
         print(
             "\t".join(
@@ -211,17 +251,41 @@ def dump_sitemaps(filemap_path: str, sitemaps: Iterable[Sitemap], outdir: str) -
             ),
             file=filemap_out,
         )
-        for sitemap in sitemaps:
-            # This is a bit of a messy way to turn the urls into filenames, but works for now
-            filename = sanitize_url(sitemap.url)
-            if filename in filename_set:
-                raise ValueError(f"filename {filename} already exists")
-            filename_set.add(filename)
-            path = os.path.join(outdir, filename)
-            wget.download(sitemap.url, path)
-            if sitemap.url.endswith(".gz"):
-                filename = gunzip(path)
-            print(f"{basename(filename)}\t{sitemap.to_fields()}", file=filemap_out)
+        rows = []
+        try:
+            for sitemap in sitemaps:
+                # This is a bit of a messy way to turn the urls into filenames, but works for now
+                filename = sanitize_url(sitemap.url)
+                if filename in filename_set:
+                    raise ValueError(f"filename {filename} already exists")
+                filename_set.add(filename)
+                path = os.path.join(outdir, filename)
+                # Gzipped sitemaps go in the filemap under their uncompressed name, as they
+                # did when they were gunzipped after downloading. open_sitemap finds them.
+                if filename.endswith(GZIP_SUFFIX):
+                    filename = filename[: -len(GZIP_SUFFIX)]
+                # Sitemaps downloaded by an earlier run are kept, so a rerun resumes
+                if os.path.exists(path):
+                    print(
+                        f"Skipping {sitemap.url}, {basename(path)} was already downloaded"
+                    )
+                else:
+                    partial_path = path + PARTIAL_DOWNLOAD_SUFFIX
+                    try:
+                        with open(partial_path, "wb") as outfile:
+                            download(sitemap.url, outfile)
+                        os.replace(partial_path, path)
+                    finally:
+                        # Only still there if the download failed or was interrupted
+                        if os.path.exists(partial_path):
+                            os.remove(partial_path)
+                rows.append(f"{basename(filename)}\t{sitemap.to_fields()}\n")
+                if len(rows) == FILEMAP_ROWS_PER_WRITE:
+                    filemap_out.writelines(rows)
+                    rows.clear()
+        finally:
+            # Write any remaining rows, including when a download fails partway through
+            filemap_out.writelines(rows)
 
 
 def download_and_extract():
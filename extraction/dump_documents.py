@@ -2,24 +2,27 @@
 """
 Script to dump all the scraped voa corpus docs stored in mongo to json files.
 """
-import json
 import os
+import re
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from multiprocessing import Process, Pool
+from functools import partial
+from multiprocessing import Pool
 from multiprocessing.queues import JoinableQueue
 from queue import Queue
 from typing import (
     Dict,
-    AbstractSet,
     Any,
+    Callable,
     Generator,
-    Iterable,
     Sequence,
     Optional,
+    Pattern,
     Tuple,
 )
 
+import orjson
 from pymongo import MongoClient
 from pymongo.collection import Collection
 
@@ -33,24 +36,80 @@ BYLINES_NOT_ALLOWED = {
     "Agence France-Presse",
     "Reuters",
 }
+# Matches any disallowed byline as a substring in one scan
+BYLINES_NOT_ALLOWED_REGEX = re.compile(
+    "|".join(re.escape(byline) for byline in sorted(BYLINES_NOT_ALLOWED))
+)
+
+# Number of documents fetched from mongo per round trip
+MONGO_BATCH_SIZE = 500
+
+# Fields of a scraped document read by extracttext.extract_document (_id is always returned)
+EXTRACTION_FIELDS = (
+    "url",
+    "sitemap_prov",
+    "original_html",
+    "utag_data",
+    "date_published",
+    "date_modified",
+    "time_retrieved",
+    "authors",
+    "keywords",
+    "parallel_url",
+    "application_ld_json",
+)
+
+# Fields of a scraped document that are or contain datetimes. The rest are plain json values.
+DATETIME_FIELDS = frozenset(
+    {
+        "date_modified",
+        "date_published",
+        "sitemap_last_modified",
+        # Holds sitemap.timestamp
+        "sitemap_prov",
+        # Older scrapes used timestamp instead of sitemap_last_modified
+        "timestamp",
+        "time_retrieved",
+    }
+)
+
+# Converters for mongo value types that aren't json serializable
+MONGO_VALUE_STRINGIFIERS: Dict[type, Callable[[Any], Any]] = {
+    datetime: datetime.isoformat,
+}
 
 
 def stringify_mongovalues(v: Any):
     """
     Mostly the values are fine, but at least datetime needs handled.
-    Also need to handle datetimes embedded in dicts, so use recursion to get them.
+    Also need to handle datetimes embedded in dicts, so nested dicts are walked with a
+    stack and their values are replaced in place.
     """
-    if type(v) == datetime:
-        return v.isoformat()
-    elif type(v) == dict:
-        return {key: stringify_mongovalues(value) for key, value in v.items()}
-    else:
+    if type(v) is dict:
+        stack = [v]
+        while stack:
+            current = stack.pop()
+            for key, value in current.items():
+                if type(value) is dict:
+                    stack.append(value)
+                else:
+                    stringify = MONGO_VALUE_STRINGIFIERS.get(type(value))
+                    if stringify is not None:
+                        current[key] = stringify(value)
         return v
+    stringify = MONGO_VALUE_STRINGIFIERS.get(type(v))
+    return stringify(v) if stringify is not None else v
 
 
 def doc_to_dict(doc) -> Dict:
     """Takes whatever the mongo doc is and turns into json serializable dict"""
-    ret = {k: stringify_mongovalues(v) for k, v in doc.items() if k != "_id"}
+    ret = {}
+    for k, v in doc.items():
+        if k == "_id":
+            continue
+        if k in DATETIME_FIELDS:
+            v = stringify_mongovalues(v)
+        ret[k] = v
     ret["_id"] = str(doc["_id"])
     return ret
 
@@ -68,13 +127,11 @@ def dump_for_language(
     ):
         lang_dir = os.path.join(outdir, iso)
         os.makedirs(lang_dir, exist_ok=True)
-        with open(
-            os.path.join(lang_dir, str(doc["_id"]) + ".json"), "w", encoding="utf8"
-        ) as outfile:
-            json.dump(doc_to_dict(doc), outfile)
+        with open(os.path.join(lang_dir, str(doc["_id"]) + ".json"), "wb") as outfile:
+            outfile.write(orjson.dumps(doc_to_dict(doc)))
 
 
-def author_allowed(doc: Dict, bad_bylines: AbstractSet):
+def author_allowed(doc: Dict, bad_bylines: Pattern = BYLINES_NOT_ALLOWED_REGEX):
     """
     Check for authors we can't distribute like AFP and AP.
     Unfortunately utag data has commas and / and sometimes multiple authors.
@@ -82,12 +139,11 @@ def author_allowed(doc: Dict, bad_bylines: AbstractSet):
     """
     if not doc["utag_data"]:
         return True
-    for bad_byline in bad_bylines:
-        if bad_byline in doc["utag_data"].get("byline", ""):
+    if bad_bylines.search(doc["utag_data"].get("byline", "")):
+        return False
+    for author in doc.get("authors", []):
+        if bad_bylines.search(author):
             return False
-        for author in doc.get("authors", []):
-            if bad_byline in author:
-                return False
     return True
 
 
@@ -97,7 +153,12 @@ def _pull_from_mongodb(
     limit: int = 0,
     content_type: str = "all",
     date_query: Optional[Dict] = None,
+    projection: Optional[Sequence[str]] = None,
 ) -> Generator[Dict, None, None]:
+    """
+    Yield distributable documents for a language.
+    If projection is given, only those fields (and _id) are pulled from mongo.
+    """
     client = MongoClient(port=port)
     voa_corpus = client.voa_corpus
     collection: Collection = voa_corpus.sitemaps
@@ -109,10 +170,12 @@ def _pull_from_mongodb(
 
     for doc in collection.find(
         query,
+        projection=projection,
         # limit of 0 is equivalent to no limit
         limit=limit,
+        batch_size=MONGO_BATCH_SIZE,
     ):
-        if not author_allowed(doc, BYLINES_NOT_ALLOWED):
+        if not author_allowed(doc):
             # Skip authors like AFP, AP, Reuters
             continue
         # Hack around "AP explains: " Title
@@ -135,19 +198,23 @@ def _queue_mongo_docs(
     batchsize: int = 100,
     date_query: Optional[Dict] = None,
 ):
+    # Each batch is queued as a single json bytes object, so it crosses the manager queue
+    # without pickling every nested value of every doc
     batch = []
     doc_count = 0
     batch_count = 0
-    for doc in _pull_from_mongodb(iso, port=port, date_query=date_query):
+    for doc in _pull_from_mongodb(
+        iso, port=port, date_query=date_query, projection=EXTRACTION_FIELDS
+    ):
         batch.append(doc_to_dict(doc))
         doc_count += 1
         if len(batch) == batchsize:
-            queue.put(batch)
+            queue.put(orjson.dumps(batch))
             batch_count += 1
             batch = []
 
     if batch:
-        queue.put(batch)
+        queue.put(orjson.dumps(batch))
         batch_count += 1
 
 
@@ -159,10 +226,13 @@ def enqueue_json_docs(
     batchsize: int = 100,
     date_query: Optional[Dict] = None,
 ) -> None:
-    pool = Pool(n_processes)
-    for language in languages:
-        pool.apply(
-            _queue_mongo_docs, args=(language, queue, port, batchsize, date_query)
+    # Pool.apply blocks, so starmap is used to actually query languages concurrently.
+    # chunksize of 1 hands out one language at a time so a slow language doesn't hold up others.
+    with Pool(n_processes) as pool:
+        pool.starmap(
+            _queue_mongo_docs,
+            [(language, queue, port, batchsize, date_query) for language in languages],
+            chunksize=1,
         )
 
 
@@ -226,42 +296,21 @@ def dump_documents():
     languages = (
         args.languages if args.languages else languages_from_filemap(args.filemap)
     )
-    batches = batch_languages(languages, args.n_processes)
-    print(batches)
     date_query = create_date_query(args.start_date, args.end_date)
-    for batch in batches:
-        processes = [
-            Process(
-                target=dump_for_language,
-                args=(
-                    lang,
-                    args.outdir,
-                    args.port,
-                    args.doc_cap,
-                    args.content_type,
-                    date_query,
-                ),
-            )
-            for lang in batch
-        ]
-        for p in processes:
-            p.start()
-
-        for p in processes:
-            p.join()
-
-
-def batch_languages(languages: Iterable[str], n_processes: int):
-    batches = []
-    batch = []
-    for i, lang in enumerate(languages):
-        batch.append(lang)
-        if i % n_processes == n_processes - 1:
-            batches.append(batch)
-            batch = []
-    if batch:
-        batches.append(batch)
-    return batches
+    dump = partial(
+        dump_for_language,
+        outdir=args.outdir,
+        port=args.port,
+        limit=args.doc_cap,
+        content_type=args.content_type,
+        date_query=date_query,
+    )
+    # Each worker picks up the next language as soon as it finishes one, so a slow language
+    # doesn't hold up a whole batch of others
+    with ProcessPoolExecutor(max_workers=args.n_processes) as executor:
+        # Consume the results so exceptions in workers are raised here
+        for _ in executor.map(dump, languages):
+            pass
 
 
 if __name__ == "__main__":
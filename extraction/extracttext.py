@@ -3,27 +3,32 @@
 Script to extract text from json dumped scrapes from scrapes mongodb.
 """
 import os
-import json
 import re
 import time
 import urllib.parse
+from enum import Enum
+from functools import lru_cache
 from multiprocessing import Semaphore, synchronize
 
 import click
+import torch
 from torch import multiprocessing
 from torch.multiprocessing import JoinableQueue, Process
 from typing import (
     Generator,
+    Iterable,
     List,
     Dict,
     Sequence,
+    Set,
     Any,
     Optional,
     Tuple,
     Union,
 )
-from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4 import BeautifulSoup, NavigableString, SoupStrainer, Tag
 import cld3
+import orjson
 import pycountry
 from spacy.tokenizer import Tokenizer
 
@@ -42,6 +47,66 @@ from extraction.utils import get_publication_date_from_utag
 
 CLD3_PROBABILITY_THRESHOLD = 0.9
 CLD3_PROPORTION_THRESHOLD = 0.05
+# Number of recent paragraphs whose cld3 predictions are kept. Boilerplate paragraphs
+# repeat across documents, so each one only needs detecting once per worker.
+PARAGRAPH_LANGUAGE_CACHE_SIZE = 4096
+
+# Leftover image comment markers that show up in paragraph text
+IMAGE_MARKER_REGEX = re.compile(
+    r"(<!-- IMAGE -->)|(<!--IMAGE -->)|(<!-- IMAGE-->)|(<-- IMAGE -->)|(!--IMAGE-LEFT-->)|(<!--IMAGE--)|(<!--IMAGE-LEFT-->)|(<!--IMAGE-->)"
+)
+
+# The only tags extract_document reads, along with everything inside them.
+# Skipping the rest of the page (nav, styles, etc) keeps the parse tree small.
+DOCUMENT_STRAINER = SoupStrainer(["a", "div", "meta", "script", "title"])
+
+# Output directories this process has already created, so ensure_dir can skip the syscalls
+_CREATED_DIRS: Set[str] = set()
+
+# Number of languages each worker keeps a segmenter and tokenizer loaded for
+MODEL_CACHE_SIZE = 3
+
+# Paragraphs starting with any of these are boilerplate rather than article text
+INVALID_PARAGRAPH_PREFIXES = (
+    "No media source currently available",
+    "Already have an account?",
+    "Log in",
+    "Sign up",
+    "Not a registered user?",
+    "The code has been copied to your clipboard",
+    "The URL has been copied to your clipboard",
+    "Embed",
+    "0:",
+    "share",
+    "Telegram Banner",
+    # AMH, "Listen to the list from the attached audio file."
+    "ዝርዝሩን ከተያያዘው የድምጽ ፋይል ያድምጡ፡፡",
+    # LAO, "Read more in English"
+    "ອ່ານຂ່າວນີ້ຕື່ມເປັນພາສາອັງກິດ",
+    # TIR, "The full content can be heard here"
+    "ምሉእ ትሕዝቶ ኣብዚ ምስማዕ ይክኣል::",
+    # UKR, "See also:"
+    "Дивіться також:",
+    # UZB, "Voices of America -"
+    '"Amerika Ovozi" -',
+    "Avec Reuters",
+    "Avec AFP",
+    # POR, "Click here to open program"
+    "Clique aqui para ouvir",
+    "- Clique aqui para ouvir",
+    "- Clique para ouvir",
+    "-Clique para ouvir",
+    "Clique na barra sobre este texto",
+    "<!-- IMAGE -->",
+)
+
+
+class WriteTarget(Enum):
+    """Where write_json_doc puts a document."""
+
+    NORMAL = "normal"
+    LANG_ID_FILTERED = "lang_id_filtered"
+    EMPTY = "empty"
 
 
 @click.group()
@@ -49,16 +114,31 @@ def cli():
     pass
 
 
+def ensure_dir(path: str) -> None:
+    """Create a directory if this process hasn't already."""
+    if path not in _CREATED_DIRS:
+        os.makedirs(path, exist_ok=True)
+        _CREATED_DIRS.add(path)
+
+
 def find_docpaths(inputdir: str) -> Generator[str, None, None]:
     """
     Walk the input dir and get all the files.
     Since each document contains language information, we don't need to maintain the
     directory structure.
     """
-    for root, dirs, files in os.walk(inputdir):
-        for file in files:
-            if file.endswith(".json"):
-                yield os.path.join(root, file)
+    # Walk with scandir directly so paths come from the directory entries
+    # instead of being joined for every file
+    dirs = [inputdir]
+    while dirs:
+        with os.scandir(dirs.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    # Like os.walk, don't descend into symlinked directories
+                    if not entry.is_symlink():
+                        dirs.append(entry.path)
+                elif entry.name.endswith(".json"):
+                    yield entry.path
 
 
 def filter_confident_langs(
@@ -78,6 +158,23 @@ def filter_confident_langs(
     }
 
 
+def count_confident_langs(
+    cld3_predictions: Dict[str, Dict[str, Any]],
+    probability_threshold: float = 0.9,
+    proportion_threshold: float = 0.01,
+) -> int:
+    """
+    Count cld3 predictions with probability and proportion above a certain threshold,
+    without building the filtered dict
+    """
+    return sum(
+        1
+        for pred in cld3_predictions.values()
+        if pred["probability"] >= probability_threshold
+        and pred["proportion"] >= proportion_threshold
+    )
+
+
 def confident_multiple_languages(
     cld3_predictions: Dict[str, Dict[str, Any]],
 ) -> bool:
@@ -85,12 +182,10 @@ def confident_multiple_languages(
         return False
     else:
         return (
-            len(
-                filter_confident_langs(
-                    cld3_predictions,
-                    probability_threshold=CLD3_PROBABILITY_THRESHOLD,
-                    proportion_threshold=CLD3_PROPORTION_THRESHOLD,
-                )
+            count_confident_langs(
+                cld3_predictions,
+                probability_threshold=CLD3_PROBABILITY_THRESHOLD,
+                proportion_threshold=CLD3_PROPORTION_THRESHOLD,
             )
             > 1
         )
@@ -108,11 +203,7 @@ def predict_language(iso: str, cld3_predictions: Dict[str, Dict[str, Any]]) -> s
     if not cld3_predictions:
         return iso
 
-    elif (
-        iso != "eng"
-        and len(cld3_predictions) == 1
-        and list(cld3_predictions)[0] == "eng"
-    ):
+    elif iso != "eng" and len(cld3_predictions) == 1 and "eng" in cld3_predictions:
         return "eng"
 
     elif confident_multiple_languages(cld3_predictions):
@@ -131,18 +222,16 @@ def reasonable_len(
     Checks that tokens / sentences are reasonable length.
     Unreasonable is when there's no sentences or there's only one sentence with fewer than 4 tokens
     """
-    if tokens:
-        if len(tokens) == 0:
-            return False
-        # Checks 1 paragraph and no sentences
-        elif len(tokens) == 1 and len(tokens[0]) == 0:
-            return False
-        # Checks for length of first paragraph first sentence if only single sentence
-        elif len(tokens) == 1 and len(tokens[0]) == 1 and len(tokens[0][0]) < tok_len:
-            return False
-        return True
-    else:
+    if not tokens:
         return n_chars > char_len
+    if len(tokens) == 1:
+        first_paragraph = tokens[0]
+        # Checks 1 paragraph and no sentences, or a single sentence that's too short
+        if not first_paragraph or (
+            len(first_paragraph) == 1 and len(first_paragraph[0]) < tok_len
+        ):
+            return False
+    return True
 
 
 def filter_english_paragraphs(
@@ -153,7 +242,7 @@ def filter_english_paragraphs(
     filtered_paragraphs = []
     removed_paragraphs = []
     for par_num, paragraph in enumerate(paragraphs):
-        cld3_predictions = language_id(paragraph)
+        cld3_predictions = paragraph_language_id(paragraph)
         if "eng" in cld3_predictions and (
             (
                 cld3_predictions["eng"]["probability"] > probability_threshold
@@ -180,7 +269,7 @@ def write_removed_paragraphs(
     removed_paragraphs: List[Tuple[int, float, float, str]],
     removed_outdir: str,
 ) -> None:
-    os.makedirs(removed_outdir, exist_ok=True)
+    ensure_dir(removed_outdir)
     with open(os.path.join(removed_outdir, filename), "w", encoding="utf8") as outfile:
         for num, prob, prop, paragraph in removed_paragraphs:
             # To keep tsv from breaking
@@ -226,8 +315,9 @@ def extract_document(
         .replace(".gov/", ".com/")
         .replace(".org/", ".com/")
     )
-    if len(modified_url.split(".com/")) == 2:
-        domain, filename = modified_url.split(".com/")
+    url_parts = modified_url.split(".com/")
+    if len(url_parts) == 2:
+        domain, filename = url_parts
         domain = (
             domain.replace("www.", "")
             .replace("https://", "")
@@ -250,8 +340,9 @@ def extract_document(
         keywords = json_doc.get("keywords", [])
         parallel = json_doc.get("parallel_url")
         application_ld_json = json_doc.get("application_ld_json", {})
-        soup = BeautifulSoup(html, "html.parser")
-        title = soup.title.getText() if soup.title else ""
+        soup = BeautifulSoup(html, features="lxml", parse_only=DOCUMENT_STRAINER)
+        title_tag = soup.title
+        title = title_tag.getText() if title_tag else ""
         if iso == "kor":
             title = title.strip("| Voice of America - Korean")
 
@@ -273,7 +364,7 @@ def extract_document(
             )
 
         n_paragraphs = len(filtered_paragraphs)
-        n_chars = sum(len(char) for char in filtered_paragraphs)
+        n_chars = sum(map(len, filtered_paragraphs))
 
         # Field contains parallel articles for LAO, but holds unneeded text in other languages
         if iso == "lao":
@@ -307,7 +398,10 @@ def extract_document(
                         filename_short, removed_paragraphs, removed_outdir
                     )
 
-        if iso in SEGMENTABLE_LANGUAGES and (
+        # Don't load models for documents with nothing to segment or tokenize
+        if not filtered_paragraphs:
+            segmenter = None
+        elif iso in SEGMENTABLE_LANGUAGES and (
             segmenter is None or segmenter.language != iso
         ):
             with sem:
@@ -321,9 +415,9 @@ def extract_document(
         # this is so we can preserve paragraph splits
 
         if segmenter:
-            sentences: Optional[List[List[str]]] = [
-                segmenter.segment(paragraph) for paragraph in filtered_paragraphs
-            ]
+            sentences: Optional[List[List[str]]] = segmenter.segment_batch(
+                filtered_paragraphs
+            )
         else:
             sentences = None
 
@@ -331,7 +425,9 @@ def extract_document(
         if sentences:
             sentences = [sent for sent in sentences if sent]
 
-        if iso in TOKENIZABLE_LANGUAGES and (
+        if not sentences:
+            tokenizer = None
+        elif iso in TOKENIZABLE_LANGUAGES and (
             tokenizer is None or tokenizer.language != iso
         ):
             with sem:
@@ -340,16 +436,14 @@ def extract_document(
             tokenizer = None
         if sentences and tokenizer:
             tokens: Optional[List[List[List[str]]]] = [
-                [tokenizer.tokenize(sent) for sent in paragraph]
-                for paragraph in sentences
+                tokenizer.tokenize_batch(paragraph) for paragraph in sentences
             ]
         else:
             tokens = None
 
-        n_tokens = (
-            sum([len(sent) for para in tokens for sent in para]) if tokens else None
-        )
-        n_sentences = sum([len(para) for para in sentences]) if sentences else None
+        # map runs len in C rather than calling it from an interpreted loop
+        n_tokens = sum(sum(map(len, para)) for para in tokens) if tokens else None
+        n_sentences = sum(map(len, sentences)) if sentences else None
 
         output_doc = Document(
             filename=filename,
@@ -377,11 +471,8 @@ def extract_document(
             section=section,
         )
 
-        # To avoid invalid outdir
-        if page_type is None:
-            page_type = "other"
-        output_directory = os.path.join(outdir, iso + "_" + domain, page_type)
-        os.makedirs(output_directory, exist_ok=True)
+        # Decide where the doc goes once, even if writing has to be retried
+        target = classify_output(output_doc, iso)
 
         # Write the doc to special directory if pub date is too early and return
         if output_doc.time_published and int(output_doc.time_published[:4]) < 2000:
@@ -394,6 +485,7 @@ def extract_document(
                 iso=iso,
                 domain=domain,
                 outdir=removed_outdir,
+                target=target,
             )
             return segmenter, tokenizer
 
@@ -404,6 +496,7 @@ def extract_document(
                 iso=iso,
                 domain=domain,
                 outdir=outdir,
+                target=target,
             )
         except OSError as exc:
             # Handles file name too long error
@@ -416,6 +509,7 @@ def extract_document(
                     iso=iso,
                     domain=domain,
                     outdir=outdir,
+                    target=target,
                 )
         print(f"Writing {filename} to {outdir}")
     else:
@@ -442,6 +536,26 @@ def confident_single_language(
         return None
 
 
+def classify_output(output_doc: Document, iso: str) -> WriteTarget:
+    """
+    Decide whether a document is written out normally, filtered by language id,
+    or only listed as having no usable content.
+    """
+    if (
+        (output_doc.predicted_language == "eng" and iso != "eng")
+        or output_doc.predicted_language == "mul"
+        or (
+            iso == "eng"
+            and confident_single_language(output_doc.cld3_detected_languages) != "eng"
+        )
+    ):
+        return WriteTarget.LANG_ID_FILTERED
+    elif reasonable_len(output_doc.tokens, output_doc.n_chars, tok_len=10):
+        return WriteTarget.NORMAL
+    else:
+        return WriteTarget.EMPTY
+
+
 def write_json_doc(
     filename: str,
     output_doc: Document,
@@ -449,34 +563,22 @@ def write_json_doc(
     iso: str,
     domain: str,
     outdir: str,
+    target: WriteTarget,
 ):
+    if target is WriteTarget.LANG_ID_FILTERED:
+        output_directory = os.path.join(outdir, iso + "_" + domain, "lang_id_filtered")
+        ensure_dir(output_directory)
+        with open(os.path.join(output_directory, filename) + ".json", "wb") as out_file:
+            out_file.write(orjson.dumps(output_doc.to_dict()))
+        return
+
     # To avoid invalid outdir
     page_type = "other" if output_doc.content_type is None else output_doc.content_type
     output_directory = os.path.join(outdir, iso + "_" + domain, page_type)
-    os.makedirs(output_directory, exist_ok=True)
-    if (
-        (output_doc.predicted_language == "eng" and iso != "eng")
-        or output_doc.predicted_language == "mul"
-        or (
-            iso == "eng"
-            and confident_single_language(output_doc.cld3_detected_languages) != "eng"
-        )
-    ):
-        output_directory = os.path.join(outdir, iso + "_" + domain, "lang_id_filtered")
-        os.makedirs(output_directory, exist_ok=True)
-        with open(
-            os.path.join(output_directory, filename) + ".json",
-            "w",
-            encoding="utf-8",
-        ) as out_file:
-            json.dump(output_doc.to_dict(), out_file, ensure_ascii=False)
-    elif reasonable_len(output_doc.tokens, output_doc.n_chars, tok_len=10):
-        with open(
-            os.path.join(output_directory, filename) + ".json",
-            "w",
-            encoding="utf-8",
-        ) as out_file:
-            json.dump(output_doc.to_dict(), out_file, ensure_ascii=False)
+    ensure_dir(output_directory)
+    if target is WriteTarget.NORMAL:
+        with open(os.path.join(output_directory, filename) + ".json", "wb") as out_file:
+            out_file.write(orjson.dumps(output_doc.to_dict()))
     else:
         # Note these aren't "empty output" per se but are filtered out
         #   for having essentially no extractable content
@@ -488,217 +590,203 @@ def write_json_doc(
             out_file.write(output_doc.url + "\n")
 
 
+@lru_cache(maxsize=None)
+def cld3_to_iso(cld3_language: str) -> str:
+    """
+    Convert a cld3 language code to ISO-639-3 where possible.
+    cld3 only predicts about a hundred languages, so every conversion is cached.
+    """
+    language = cld3_language
+    if language.endswith("-Latn"):
+        language = language[:-5]
+    if len(language) == 2:
+        pycountry_language = pycountry.languages.get(alpha_2=language)
+        if pycountry_language:
+            language = pycountry_language.alpha_3
+    return language
+
+
 def language_id(text: str) -> Dict[str, Dict[str, Any]]:
-    languages: Dict[str, Dict[str, str]] = {}
+    languages: Dict[str, Dict[str, Any]] = {}
     for prediction in cld3.get_frequent_languages(text, num_langs=5):
-        language = prediction.language
-        if language.endswith("-Latn"):
-            language = language[:-5]
-        if len(language) == 2 and pycountry.languages.get(alpha_2=language):
-            language = pycountry.languages.get(alpha_2=language).alpha_3
-        languages[language] = {}
-        languages[language]["cld3_language"] = prediction.language
-        languages[language]["probability"] = prediction.probability
-        languages[language]["is_reliable"] = prediction.is_reliable
-        languages[language]["proportion"] = prediction.proportion
+        languages[cld3_to_iso(prediction.language)] = {
+            "cld3_language": prediction.language,
+            "probability": prediction.probability,
+            "is_reliable": prediction.is_reliable,
+            "proportion": prediction.proportion,
+        }
     return languages
 
 
-def extract_text(soup, iso) -> List[str]:
-    text = []
+@lru_cache(maxsize=PARAGRAPH_LANGUAGE_CACHE_SIZE)
+def paragraph_language_id(paragraph: str) -> Dict[str, Dict[str, Any]]:
+    """
+    language_id for a single paragraph, reusing the predictions for recently seen ones.
+    The predictions are shared between calls, so callers must not change them.
+    """
+    return language_id(paragraph)
+
+
+def split_on_br(tag: Tag) -> List[str]:
+    """
+    Split the text directly inside a tag into pieces at each <br>.
+    Newlines within the text itself are dropped.
+    """
+    split_text = []
+    text_pieces = []
+    for child in tag.children:
+        if type(child) is NavigableString:
+            text_pieces.append(child.replace("\n", ""))
+        elif child.name == "br":
+            split_text.append("".join(text_pieces))
+            text_pieces = []
+    # Remaining pieces
+    if text_pieces:
+        split_text.append("".join(text_pieces))
+    return split_text
+
+
+def valid_paragraphs(lines: Iterable[str]) -> Generator[str, None, None]:
+    """Strip each line once and yield the ones that pass is_valid."""
+    for paragraph in map(str.strip, lines):
+        if is_valid(paragraph):
+            yield paragraph
+
+
+def iter_paragraphs(soup, iso) -> Generator[str, None, None]:
+    """
+    Yield the candidate paragraphs of a page in order, without building a list
+    for each container along the way.
+    """
+    # Walk the tree once to find all the text containers, then process each kind in turn
+    intro = []
+    article = []
+    article2 = []
+    for div in soup.find_all("div"):
+        classes = div.get("class", ())
+        if "intro" in classes:
+            intro.append(div)
+        if div.get("id") == "article-content":
+            article.append(div)
+        if "article__content" in classes:
+            article2.append(div)
 
-    intro = soup.find_all("div", class_="intro")
     for i in intro:
-        p_tag = i.find_all("p")
-        for p in p_tag:
-            split_p = p.getText().split("\n")
-            text_intro = [
-                intro_paragraph
-                for s in split_p
-                if is_valid(intro_paragraph := s.strip() and s.strip())
-            ]
-            text.extend(text_intro)
+        for p in i.find_all("p"):
+            yield from valid_paragraphs(p.getText().split("\n"))
 
-    article = soup.find_all("div", attrs={"id": "article-content"})
     for a in article:
         if comments := a.find(class_="comments"):
             # Remove comments from tree
             comments.extract()
 
         if dateline := a.find("span", class_="dateline"):
-            text.append(dateline.getText(strip=True))
+            yield dateline.getText(strip=True)
 
         p_tag = a.find_all("p")
         # Assumes SNA is already split into paragraphs
         if iso == "sna":
-            text_article = [
-                sna_paragraph
-                for p in p_tag
-                if is_valid(
-                    sna_paragraph := p.getText(strip=True).strip().replace("\n", " ")
-                )
-            ]
-            text.extend(text_article)
+            for p in p_tag:
+                sna_paragraph = p.getText(strip=True).strip().replace("\n", " ")
+                if is_valid(sna_paragraph):
+                    yield sna_paragraph
         else:
             for p in p_tag:
-                # split_p = p.getText().split("\n")
-                split_p = []
-                text_pieces = []
-                for child in p.children:
-                    if type(child) is NavigableString:
-                        text_pieces.extend(child.split("\n"))
-                    elif child.name == "br":
-                        split_p.append("".join(text_pieces))
-                        text_pieces = []
-                # Remaining pieces
-                if text_pieces:
-                    split_p.append("".join(text_pieces))
-                text_article = [
-                    article_paragraph
-                    for s in split_p
-                    if is_valid(article_paragraph := s.strip()) and s.strip()
-                ]
-                text.extend(text_article)
+                yield from valid_paragraphs(split_on_br(p))
 
         if not p_tag:
-            wsw_class = a.find_all("div", class_="wsw")
-            for w in wsw_class:
-                split_w = []
-                text_pieces = []
-                for child in w.children:
-                    if type(child) is NavigableString:
-                        text_pieces.extend(child.split("\n"))
-                    elif child.name == "br":
-                        split_w.append("".join(text_pieces))
-                        text_pieces = []
-                # Remaining pieces
-                if text_pieces:
-                    split_w.append("".join(text_pieces))
-
-                text_article = [
-                    paragraph_text
-                    for s in split_w
-                    if is_valid(paragraph_text := s.strip()) and s.strip()
-                ]
-                text.extend(text_article)
-
-    article2 = soup.find_all("div", class_="article__content")
+            for w in a.find_all("div", class_="wsw"):
+                yield from valid_paragraphs(split_on_br(w))
+
     for a in article2:
-        p_tag = a.find_all("p")
-        for p in p_tag:
-            split_p = []
-            text_pieces = []
-            for child in p.children:
-                if type(child) is NavigableString:
-                    text_pieces.extend(child.split("\n"))
-                elif child.name == "br":
-                    split_p.append("".join(text_pieces))
-                    text_pieces = []
-            # Remaining pieces
-            if text_pieces:
-                split_p.append("".join(text_pieces))
-            text_article = [
-                paragraph for s in split_p if is_valid(paragraph := s.strip())
-            ]
-            text.extend(text_article)
+        for p in a.find_all("p"):
+            yield from valid_paragraphs(split_on_br(p))
+
+
+def extract_text(soup, iso) -> List[str]:
     # Remove IMAGE, removing here since valid can throw out entire paragraphs
     # Appears that this also occurs in middle of paragraphs
-    text = [
-        re.sub(
-            r"(<!-- IMAGE -->)|(<!--IMAGE -->)|(<!-- IMAGE-->)|(<-- IMAGE -->)|(!--IMAGE-LEFT-->)|(<!--IMAGE--)|(<!--IMAGE-LEFT-->)|(<!--IMAGE-->)",
-            "",
-            t,
-        )
-        for t in text
+    # Every marker contains IMAGE, so most paragraphs can skip the regex entirely
+    return [
+        IMAGE_MARKER_REGEX.sub("", t) if "IMAGE" in t else t
+        for t in iter_paragraphs(soup, iso)
     ]
-    return text
 
 
 def is_valid(text: str) -> bool:
     """
     Simple check to eliminate and filter obviously bad text in paragraph tags.
     """
-    text = text.strip()
     text = " ".join(text.split())
-    if not text:
-        return False
-    elif text.startswith("No media source currently available"):
-        return False
-    elif text.startswith("Already have an account?"):
-        return False
-    elif text.startswith("Log in"):
-        return False
-    elif text.startswith("Sign up"):
-        return False
-    elif text.startswith("Not a registered user?"):
-        return False
-    elif text.startswith("The code has been copied to your clipboard"):
-        return False
-    elif text.startswith("The URL has been copied to your clipboard"):
-        return False
-    elif text.startswith("Embed"):
-        return False
-    elif text.startswith("0:"):
-        return False
-    elif text.startswith("share"):
-        return False
-    elif text.startswith("Telegram Banner"):
-        return False
-    # AMH, "Listen to the list from the attached audio file."
-    elif text.startswith("ዝርዝሩን ከተያያዘው የድምጽ ፋይል ያድምጡ፡፡"):
-        return False
-    # LAO, "Read more in English"
-    elif text.startswith("ອ່ານຂ່າວນີ້ຕື່ມເປັນພາສາອັງກິດ"):
-        return False
-    # TIR, "The full content can be heard here"
-    elif text.startswith("ምሉእ ትሕዝቶ ኣብዚ ምስማዕ ይክኣል::"):
-        return False
-    # UKR, "See also:"
-    elif text.startswith("Дивіться також:"):
-        return False
-    # UZB, "Voices of America -"
-    elif text.startswith('"Amerika Ovozi" -'):
-        return False
-    elif text.startswith("Avec Reuters"):
-        return False
-    elif text.startswith("Avec AFP"):
-        return False
-    # POR, "Click here to open program"
-    elif text.startswith("Clique aqui para ouvir"):
-        return False
-    elif text.startswith("- Clique aqui para ouvir"):
-        return False
-    elif text.startswith("- Clique para ouvir"):
-        return False
-    elif text.startswith("-Clique para ouvir"):
-        return False
-    elif text.startswith("Clique na barra sobre este texto"):
-        return False
-    elif text.startswith("<!-- IMAGE -->"):
-        return False
-    else:
-        return True
+    # startswith checks every prefix in the tuple in a single call
+    return bool(text) and not text.startswith(INVALID_PARAGRAPH_PREFIXES)
+
+
+def _cache_model(cache: Dict[str, Any], iso: str, model: Any) -> None:
+    """
+    Keep a model as the most recently used for its language, dropping the least recently
+    used model once the cache is full. Relies on dicts keeping insertion order.
+    """
+    if model is None:
+        return
+    cache.pop(iso, None)
+    cache[iso] = model
+    if len(cache) > MODEL_CACHE_SIZE:
+        del cache[next(iter(cache))]
+
+
+def _extract_with_cached_models(
+    json_doc: Dict,
+    outdir: str,
+    segmenters: Dict[str, Segmenter],
+    tokenizers: Dict[str, Tokenizer],
+    sem: synchronize.Semaphore,
+    cuda_id=None,
+) -> None:
+    """
+    Extract a document, reusing a worker's segmenter and tokenizer for the document's
+    language if it has loaded them recently.
+    """
+    iso = json_doc.get("sitemap_prov", {}).get("sitemap", {}).get("iso")
+    segmenter, tokenizer = extract_document(
+        json_doc,
+        outdir,
+        segmenters.get(iso),
+        tokenizers.get(iso),
+        sem,
+        cuda_id=cuda_id,
+    )
+    _cache_model(segmenters, iso, segmenter)
+    _cache_model(tokenizers, iso, tokenizer)
+
+
+def _share_cpus(n_workers: int) -> None:
+    """
+    Give each worker process an even share of the cpus for torch's own threads, so
+    models running on the cpu in every worker at once don't oversubscribe them.
+    """
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // n_workers))
 
 
 def _process_paths(
-    queue: JoinableQueue, worker_id: int, outdir: str, sem: synchronize.Semaphore
+    queue: JoinableQueue,
+    worker_id: int,
+    outdir: str,
+    sem: synchronize.Semaphore,
+    n_workers: int = 1,
 ) -> None:
     print(f"Starting worker {worker_id}")
+    _share_cpus(n_workers)
     # Segmenters and tokenizers get setup based on language in extract_document
-    segmenter = None
-    tokenizer = None
+    segmenters: Dict[str, Segmenter] = {}
+    tokenizers: Dict[str, Tokenizer] = {}
     while True:
         batch = queue.get()
         for path in sorted(batch):
-            with open(path) as file:
-                json_doc = json.load(file)
-            segmenter, tokenizer = extract_document(
-                json_doc,
-                outdir,
-                segmenter,
-                tokenizer,
-                sem,
-                cuda_id=worker_id % 2,
+            with open(path, "rb") as file:
+                json_doc = orjson.loads(file.read())
+            _extract_with_cached_models(
+                json_doc, outdir, segmenters, tokenizers, sem, cuda_id=worker_id % 2
             )
         queue.task_done()
 
@@ -707,21 +795,24 @@ def _process_jsondocs(
     queue: JoinableQueue,
     worker_id: int,
     outdir: str,
-    sem: synchronize.Semaphore
+    sem: synchronize.Semaphore,
+    n_workers: int = 1,
     # tokenizers: Dict[str, Tokenizer],
 ) -> None:
     print(f"Starting worker {worker_id}")
+    _share_cpus(n_workers)
     # Segmenters and tokenizers get setup based on language in extract_document
-    segmenter = None
-    tokenizer = None
+    segmenters: Dict[str, Segmenter] = {}
+    tokenizers: Dict[str, Tokenizer] = {}
     while True:
-        batch = queue.get()
+        # Batches arrive as json bytes, see _queue_mongo_docs
+        batch = orjson.loads(queue.get())
         for json_doc in batch:
-            segmenter, tokenizer = extract_document(
+            _extract_with_cached_models(
                 json_doc,
                 outdir,
-                segmenter,
-                tokenizer,
+                segmenters,
+                tokenizers,
                 sem,
                 cuda_id=worker_id % 2,
             )
@@ -743,7 +834,7 @@ def fromfiles(
     queue: JoinableQueue = JoinableQueue()
     sem = multiprocessing.Semaphore(1)
     workers = [
-        Process(target=_process_paths, args=(queue, i, outputdir, sem))
+        Process(target=_process_paths, args=(queue, i, outputdir, sem, n_workers))
         for i in range(n_workers)
     ]
     for worker in workers:
@@ -807,7 +898,7 @@ def fromdb(
     workers = [
         Process(
             target=_process_jsondocs,
-            args=(queue, i, outputdir, sem),
+            args=(queue, i, outputdir, sem, n_extractors),
         )
         for i in range(n_extractors)
     ]
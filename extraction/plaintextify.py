@@ -4,12 +4,66 @@ Takes a directory of extractions json and writes to two output directories:
 plaintext paragraph dumps and one sentence tokenized per line.
 Skips empty_output.txt files and filtered by language id dir.
 """
-import json
 import os
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Generator, List, Optional
+
+import orjson
 
 from extraction.document import Document
 
+# Documents sent to a worker at a time, so per-document IPC overhead is amortized
+PLAINTEXTIFY_CHUNKSIZE = 64
+
+
+def tokenized_lines(doc: Document) -> Generator[str, None, None]:
+    """
+    Yield the tokenized output for a document piece by piece: the title, then one
+    sentence per line with a blank line between paragraphs.
+    """
+    yield doc.title + "\n\n"
+    for par_num, paragraph in enumerate(doc.tokens):
+        if par_num:
+            yield "\n\n"
+        for sent_num, sent in enumerate(paragraph):
+            if sent_num:
+                yield "\n"
+            yield " ".join(sent)
+
+
+def plaintextify_file(
+    filepath: str,
+    raw_sub: str,
+    sents_sub: str,
+    *,
+    section: Optional[str] = None,
+    keyword: Optional[str] = None,
+    raw_only: bool = False,
+    tokenized_only: bool = False,
+) -> None:
+    """
+    Write the raw paragraphs and tokenized sentences for one extracted json document.
+    """
+    with open(filepath, "rb") as infile:
+        json_dict = orjson.loads(infile.read())
+        doc = Document.from_dict(json_dict)
+    # Skip document if filtering by section
+    if section and section != doc.section:
+        return
+    if keyword and keyword not in doc.keywords:
+        return
+    filename = doc.filename.replace(".html", "") + ".txt"
+    raw_path = os.path.join(raw_sub, filename)
+    sents_path = os.path.join(sents_sub, filename)
+    if not tokenized_only:
+        with open(raw_path, "w", encoding="utf8") as raw_out:
+            raw_out.write("\n\n".join([doc.title] + doc.paragraphs))
+    if not raw_only:
+        with open(sents_path, "w", encoding="utf8") as sents_out:
+            sents_out.writelines(tokenized_lines(doc))
+
 
 def plaintextify():
     parser = ArgumentParser(description=__doc__)
@@ -19,11 +73,17 @@ def plaintextify():
     parser.add_argument("--keyword", help="Filter articles of a certain section")
     parser.add_argument("--raw-only", action="store_true")
     parser.add_argument("--tokenized-only", action="store_true")
+    parser.add_argument("--n-processes", default=1, type=int)
     args = parser.parse_args()
 
     raw_outdir = os.path.join(args.outputdir, "raw_paragraphs")
     sents_outdir = os.path.join(args.outputdir, "tokenized_sentences")
 
+    # Arguments to plaintextify_file for every document, gathered up front so the
+    # documents can be spread across processes
+    filepaths: List[str] = []
+    raw_subs: List[str] = []
+    sents_subs: List[str] = []
     # Walk the input dir
     for subdir in os.listdir(args.inputdir):
 
@@ -42,38 +102,40 @@ def plaintextify():
             os.makedirs(raw_sub, exist_ok=True)
         if not args.raw_only:
             os.makedirs(sents_sub, exist_ok=True)
-        files = os.listdir(insubdir)
-        for f in files:
-            # This ignores empty_output.txt, which is just a list of urls where we didn't
-            # extract anything, but it also covers OS files like .DS_Store
-            if not f.endswith(".json"):
-                continue
-            filepath = os.path.join(insubdir, f)
-            with open(filepath, "r", encoding="utf8") as infile:
-                json_dict = json.load(infile)
-                doc = Document.from_dict(json_dict)
-            # Skip document if filtering by section
-            if args.section and args.section != doc.section:
-                continue
-            if args.keyword and args.keyword not in doc.keywords:
-                continue
-            filename = doc.filename.replace(".html", "") + ".txt"
-            raw_path = os.path.join(raw_sub, filename)
-            sents_path = os.path.join(sents_sub, filename)
-            if not args.tokenized_only:
-                with open(raw_path, "w", encoding="utf8") as raw_out:
-                    raw_out.write("\n\n".join([doc.title] + doc.paragraphs))
-            if not args.raw_only:
-                with open(sents_path, "w", encoding="utf8") as sents_out:
-                    sents_out.write(doc.title + "\n\n")
-                    sents_out.write(
-                        "\n\n".join(
-                            [
-                                "\n".join([" ".join(sent) for sent in paragraph])
-                                for paragraph in doc.tokens
-                            ]
-                        )
-                    )
+        with os.scandir(insubdir) as entries:
+            sub_filepaths = [
+                entry.path
+                for entry in entries
+                # This ignores empty_output.txt, which is just a list of urls where we
+                # didn't extract anything, but it also covers OS files like .DS_Store
+                if entry.name.endswith(".json")
+            ]
+        filepaths.extend(sub_filepaths)
+        raw_subs.extend([raw_sub] * len(sub_filepaths))
+        sents_subs.extend([sents_sub] * len(sub_filepaths))
+
+    write_doc = partial(
+        plaintextify_file,
+        section=args.section,
+        keyword=args.keyword,
+        raw_only=args.raw_only,
+        tokenized_only=args.tokenized_only,
+    )
+    if args.n_processes == 1:
+        # Convert in this process, without starting a pool
+        for filepath, raw_sub, sents_sub in zip(filepaths, raw_subs, sents_subs):
+            write_doc(filepath, raw_sub, sents_sub)
+        return
+    with ProcessPoolExecutor(max_workers=args.n_processes) as executor:
+        # Consume the results so exceptions in workers are raised here
+        for _ in executor.map(
+            write_doc,
+            filepaths,
+            raw_subs,
+            sents_subs,
+            chunksize=PLAINTEXTIFY_CHUNKSIZE,
+        ):
+            pass
 
 
 if __name__ == "__main__":
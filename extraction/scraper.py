@@ -4,33 +4,72 @@ Script to download sitemaps and check if they have obvious text in them.
 Reports success and failures and number of docs that have text
 """
 import asyncio
+import csv
+import hashlib
 import json
 import os
 import re
 
-from asyncio import Semaphore
 from collections import defaultdict, Counter
 from datetime import datetime
-
-from typing import Sequence, Dict, Generator, Iterable, List, Optional, Tuple
+from functools import partial
+from itertools import islice
+
+from typing import (
+    Any,
+    Callable,
+    Sequence,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
 import aiohttp
 import click
 import json5
 from aiohttp import ClientSession, ClientResponseError
 from attr import attrs, attrib
-from bs4 import BeautifulSoup, Tag
-from lxml import etree, objectify
+from bson import ObjectId
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from lxml import etree
 from lxml.etree import XMLSyntaxError
 from pymongo import MongoClient, DESCENDING, HASHED
 from pymongo.collection import Collection
 
-from extraction.downloadsitemaps import Sitemap
-from extraction.utils import get_sitemap_collection, get_publication_date_from_utag
+from extraction.downloadsitemaps import Sitemap, open_sitemap
+from extraction.utils import create_sitemap_collection, get_publication_date_from_utag
 
 VOA_CORPUS = "voa_corpus"
 VAR_UTAG_PATTERN = re.compile(r"var\s+utag_data\s*=\s*({.*})")
 
+T = TypeVar("T")
+
+# Number of scraped pages buffered before they're inserted into mongo together
+INSERT_BATCH_SIZE = 100
+# Fields of existing documents needed to deduplicate a newly scraped page
+DEDUPLICATION_FIELDS = ("iso", "latest", "url")
+# Bytes of blake2b digest kept per url when deduplicating sitemap pages
+URL_HASH_SIZE = 8
+# Pages waiting in the scrape queue per connection, enough to keep every worker busy
+PAGES_QUEUED_PER_CONNECTION = 4
+# Tags read from a scraped page. Everything else is dropped while parsing.
+PAGE_TAG_NAMES = ["link", "meta", "p", "script"]
+PAGE_STRAINER = SoupStrainer(PAGE_TAG_NAMES)
+# Names of the meta tags whose content is kept, besides authors
+PAGE_META_NAMES = frozenset({"description", "keywords", "title"})
+# Paragraphs starting with any of these are boilerplate rather than article text
+INVALID_PARAGRAPH_PREFIXES = (
+    "No media source currently available",
+    "Already have an account?",
+    "Log in",
+    "Sign up",
+    "Not a registered user?",
+)
+
 
 @attrs(frozen=True, auto_attribs=True)
 class SitemapFile:
@@ -68,21 +107,22 @@ class Page:
         news = {}
         metadata = {}
         for tag in node:
-            if etree.QName(tag).localname == "loc":
+            name = localname(tag)
+            if name == "loc":
                 url = tag.text
-            elif etree.QName(tag).localname == "lastmod":
+            elif name == "lastmod":
                 timestamp = cls.parse_timestamp(tag.text)
-            elif etree.QName(tag).localname == "priority":
+            elif name == "priority":
                 priority = tag.text
-            elif etree.QName(tag).localname == "changefreq":
+            elif name == "changefreq":
                 changefreq = tag.text
-            elif etree.QName(tag).localname == "news":
+            elif name == "news":
                 news = gather_subtags(tag)
-            elif etree.QName(tag).localname == "video":
+            elif name == "video":
                 video = gather_subtags(tag)
             else:
                 print("Name not handled:")
-                print(etree.QName(tag).localname)
+                print(name)
                 print()
             if news:
                 metadata["news"] = news
@@ -102,6 +142,15 @@ class Page:
         # Hacking to get format correct. Trim the millisecond decimals if needed
         if len(s) >= len("2021-06-13T02:05:46.170195Z"):
             s = s[: len("2021-06-13T02:05:46.170195")] + "Z"
+        if not s.endswith("Z"):
+            # Neither strptime format below can match without the Z
+            return datetime.fromisoformat(s)
+        # fromisoformat is much faster than strptime and handles the usual timestamps,
+        # which saves raising and catching exceptions for most pages
+        try:
+            return datetime.fromisoformat(s[:-1])
+        except ValueError:
+            pass
         try:
             return datetime.strptime(s, "%Y-%m-%dT%H:%M:%S.%fZ")
         except:
@@ -155,55 +204,59 @@ class Page:
 
 def read_filemap(filemap: str) -> Dict[str, List[SitemapFile]]:
     sitemaps = defaultdict(list)
-    with open(filemap, "r", encoding="utf8") as f:
-        for i, line in enumerate(f):
-            # Skip header
-            if i == 0:
-                continue
+    with open(filemap, "r", encoding="utf8", newline="") as f:
+        # Fields are never quoted, so quote characters are read as-is
+        reader = csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE)
+        # Skip header
+        next(reader, None)
+        for row in reader:
             # make a sitemaps by language, store each sitemap with it's prov info
-            fields = line.split("\t")
-            sitemaps[fields[2]].append(
-                SitemapFile.from_fields(
-                    # filename, url, iso, language, site_name, timestamp, region
-                    (
-                        fields[0],
-                        fields[1],
-                        fields[2],
-                        fields[3],
-                        fields[4],
-                        fields[5],
-                        fields[6],
-                    )
-                )
-            )
+            # filename, url, iso, language, site_name, timestamp, region
+            sitemaps[row[2]].append(SitemapFile(row[0], Sitemap(*row[1:7])))
     return sitemaps
 
 
+def localname(tag) -> str:
+    """Tag name without its namespace, without building an etree.QName."""
+    return tag.tag.rpartition("}")[2]
+
+
 def gather_subtags(tag):
     """There's a bunch of subtags on video and news, so just throw those in a dict for now"""
-    return {etree.QName(subtag).localname: subtag.text for subtag in tag}
+    return {localname(subtag): subtag.text for subtag in tag}
+
+
+def hash_url(url: str) -> bytes:
+    """Short digest of a url for deduplication. Collisions are negligible at our scale."""
+    return hashlib.blake2b(url.encode("utf8"), digest_size=URL_HASH_SIZE).digest()
 
 
 def pages_from_sitemaps(
     sitemap_list: Sequence[SitemapFile], sitemap_dir: str
 ) -> Generator[Page, None, None]:
-    existing_urls = set()
+    # Short hashes of the urls seen so far, which take far less memory than the urls
+    existing_url_hashes = set()
     for sitemap in sitemap_list:
-        with open(os.path.join(sitemap_dir, sitemap.filename), "rb") as site_file:
+        with open_sitemap(os.path.join(sitemap_dir, sitemap.filename)) as site_file:
+            # Stream the sitemap so only one <url> element is in memory at a time
             try:
-                tree = etree.XML(site_file.read())
+                for _, node in etree.iterparse(
+                    site_file, events=("end",), tag="{*}url"
+                ):
+                    page = Page.from_node(node, sitemap)
+                    # Free the finished element and any earlier siblings
+                    node.clear()
+                    while node.getprevious() is not None:
+                        del node.getparent()[0]
+                    if not page.url:
+                        continue
+                    url_hash = hash_url(page.url)
+                    if url_hash in existing_url_hashes:
+                        continue
+                    existing_url_hashes.add(url_hash)
+                    yield page
             except XMLSyntaxError as e:
                 print(f"Couldn't parse {sitemap.filename}. {e}")
-                continue
-            objectify.deannotate(tree, cleanup_namespaces=True)
-            for node in tree:
-                page = Page.from_node(node, sitemap)
-                if not page.url:
-                    continue
-                if page.url in existing_urls:
-                    continue
-                existing_urls.add(page.url)
-                yield page
 
 
 def is_valid(text: str) -> bool:
@@ -211,20 +264,7 @@ def is_valid(text: str) -> bool:
     Simple check to eliminate obviously bad text in paragraph tags.
     """
     text = text.strip()
-    if not text:
-        return False
-    elif text.startswith("No media source currently available"):
-        return False
-    elif text.startswith("Already have an account?"):
-        return False
-    elif text.startswith("Log in"):
-        return False
-    elif text.startswith("Sign up"):
-        return False
-    elif text.startswith("Not a registered user?"):
-        return False
-    else:
-        return True
+    return bool(text) and not text.startswith(INVALID_PARAGRAPH_PREFIXES)
 
 
 @attrs(frozen=True, auto_attribs=True)
@@ -257,17 +297,28 @@ async def request_page(url: Optional[str], session: ClientSession) -> PageResult
         return PageResult(success, timestamp, None, str(e))
 
 
+def loads_lenient_json(text: str) -> Any:
+    """
+    Parse json that may use json5 extensions like unquoted keys or trailing commas.
+    Most pages have strict json, which the json module parses far faster than json5.
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json5.loads(text)
+
+
 def extract_utag_data(scripts: Optional[Sequence[Tag]], url: Optional[str]) -> Dict:
     if scripts is None:
         # Has no scripts so return empty
         return {}
     try:
         for script in scripts:
-            # text = script.getText()
-            if script:
-                match = VAR_UTAG_PATTERN.search(str(script))
+            # Search the script's text as parsed, rather than serializing the whole tag
+            if script and script.string:
+                match = VAR_UTAG_PATTERN.search(script.string)
                 if match:
-                    return json5.loads(match.group(1))
+                    return loads_lenient_json(match.group(1))
     except ValueError as e:
         with open("utag_data.log", "a", encoding="utf8") as logfile:
             print(url, file=logfile)
@@ -288,47 +339,60 @@ def extract_ld_json(scripts: Optional[Sequence[Tag]]) -> Dict:
             if script.contents:
                 json_text = script.contents[0]
                 if json_text:
-                    return json5.loads(json_text)
+                    return loads_lenient_json(json_text)
     # Couldn't find a match so return empty
     return {}
 
 
-async def scrape_page(
-    page: Page, session: ClientSession, mongo_collection: Collection, sem: Semaphore
-):
+async def scrape_page(page: Page, session: ClientSession, writer: "PageWriter"):
     # # Bare except is bad, but not clear what error is thrown
     # failures += 1
-    async with sem:
-        page_result = await request_page(page.url, session)
+    page_result = await request_page(page.url, session)
     has_ptags = False
     html_tag_metadata = {}
     # text = ""
     if page_result.content is not None:
-        soup = BeautifulSoup(page_result.content, features="lxml")
-        paragraphs = soup.find_all("p")
-        if paragraphs:
-            texts = [p.getText() for p in paragraphs if is_valid(p.getText())]
-            if texts:
-                # text = "\n".join(texts)
-                has_ptags = True
-        title = soup.find("meta", {"name": "title"})
-        description = soup.find("meta", {"name": "description"})
-        canonical_link = soup.find("link", {"rel": "canonical"})
-        keywords = soup.find("meta", {"name": "keywords"})
-        authors = soup.find_all("meta", {"name": "Author"})
-        author_list = [author["content"] for author in authors]
-        title = await get_content(title)
-        description = await get_content(description)
-        canonical_link = await get_content(canonical_link, "href")
-        keywords = await get_content(keywords)
+        soup = BeautifulSoup(
+            page_result.content, features="lxml", parse_only=PAGE_STRAINER
+        )
+        # Gather every tag needed from the page in a single walk over the tree
+        paragraphs = []
+        meta_tags = {}
+        author_list = []
+        canonical_link = None
+        scripts = []
+        ld_scripts = []
+        for tag in soup.find_all(PAGE_TAG_NAMES):
+            if tag.name == "p":
+                paragraphs.append(tag)
+            elif tag.name == "meta":
+                meta_name = tag.get("name")
+                if meta_name == "Author":
+                    author_list.append(tag["content"])
+                elif meta_name in PAGE_META_NAMES:
+                    # Only the first of each is used
+                    meta_tags.setdefault(meta_name, tag)
+            elif tag.name == "link":
+                rels = tag.get_attribute_list("rel")
+                if canonical_link is None and "canonical" in rels:
+                    canonical_link = tag
+            else:
+                script_type = tag.get("type")
+                if script_type == "text/javascript":
+                    scripts.append(tag)
+                elif script_type == "application/ld+json":
+                    ld_scripts.append(tag)
+        has_ptags = any(is_valid(p.getText()) for p in paragraphs)
+        title = get_content(meta_tags.get("title"))
+        description = get_content(meta_tags.get("description"))
+        canonical_link = get_content(canonical_link, "href")
+        keywords = get_content(meta_tags.get("keywords"))
         if keywords:
             keywords = [keyword.strip() for keyword in keywords.split(",")]
         else:
             keywords = []
 
-        scripts = soup.find_all("script", {"type": "text/javascript"})
         utag_data = extract_utag_data(scripts, page.url)
-        ld_scripts = soup.find_all("script", {"type": "application/ld+json"})
         ld_json = extract_ld_json(ld_scripts)
         date_published = ld_json.get("datePublished")
         date_modified = ld_json.get("dateModified")
@@ -359,18 +423,153 @@ async def scrape_page(
         }
 
     await insert_page(
-        mongo_collection, page_result, html_tag_metadata=html_tag_metadata, page=page
+        writer, page_result, html_tag_metadata=html_tag_metadata, page=page
     )
 
 
-async def get_content(tag, att_name: str = "content") -> Optional[str]:
+def get_content(tag: Optional[Tag], att_name: str = "content") -> Optional[str]:
     if tag:
         tag = tag.get(att_name, None)
     return tag
 
 
+class PageWriter:
+    """
+    Writes scraped pages to mongo. Pages that don't need deduplication are buffered and
+    inserted in bulk. Anything that looks up earlier versions of a page flushes the buffer
+    first, so those lookups still see every page scraped so far.
+    The blocking pymongo calls run in a thread so scraping carries on in the meantime,
+    but a lock keeps them in order.
+    """
+
+    def __init__(self, collection: Collection, batch_size: int = INSERT_BATCH_SIZE):
+        self.collection = collection
+        self.batch_size = batch_size
+        self._pending: List[Tuple[Dict, Page, PageResult]] = []
+        self._lock = asyncio.Lock()
+
+    async def insert(self, document: Dict, page: Page, page_result: PageResult) -> None:
+        # Assign the id up front so a partially written batch can be retried without
+        # duplicating the documents that did make it in
+        document.setdefault("_id", ObjectId())
+        self._pending.append((document, page, page_result))
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            await self._flush_pending()
+
+    async def insert_deduplicated(
+        self, document: Dict, page: Page, page_result: PageResult
+    ) -> None:
+        """
+        Insert a page as the latest version of its canonical link and url, marking
+        any earlier versions in the same language as no longer latest.
+        """
+        async with self._lock:
+            # Earlier versions of this page may still be buffered
+            await self._flush_pending()
+            inserted = await _in_thread(
+                self._insert_over_earlier_versions, document, page, page_result
+            )
+        if not inserted:
+            await insert_without_deduplication(self, document, page, page_result)
+
+    async def _flush_pending(self) -> None:
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        await _in_thread(self._write_batch, pending)
+
+    def _write_batch(self, pending: List[Tuple[Dict, Page, PageResult]]) -> None:
+        try:
+            self.collection.insert_many(
+                [document for document, _, _ in pending], ordered=False
+            )
+        except UnicodeEncodeError:
+            # Retry one at a time so only the offending documents are replaced
+            for document, page, page_result in pending:
+                try:
+                    self.collection.replace_one(
+                        {"_id": document["_id"]}, document, upsert=True
+                    )
+                except UnicodeEncodeError as e:
+                    print(f"Unicode error on {page.url}")
+                    self.collection.insert_one(
+                        unicode_error_document(page, page_result, e)
+                    )
+
+    def _insert_over_earlier_versions(
+        self, document: Dict, page: Page, page_result: PageResult
+    ) -> bool:
+        """
+        Returns False without inserting anything if there are no earlier versions.
+        """
+        existing_docids_in_language = []
+        parallel_url = None
+        # One round trip for both lookups, only pulling the fields needed here
+        # rather than whole documents with their html
+        for doc in self.collection.find(
+            {
+                "$or": [
+                    {"canonical_link": document["canonical_link"]},
+                    {"url": document["url"]},
+                ]
+            },
+            projection=DEDUPLICATION_FIELDS,
+        ):
+            if doc["iso"] == document["iso"]:
+                existing_docids_in_language.append(doc["_id"])
+            elif doc["latest"]:
+                parallel_url = doc["url"]
+        document["parallel_url"] = parallel_url
+        existing_docids = list(set(existing_docids_in_language))
+        if not existing_docids:
+            return False
+        # Collision of canonical links, check and set latest if not an error
+        document["latest"] = True
+        try:
+            self.collection.insert_one(document)
+            self.collection.update_many(
+                {"_id": {"$in": existing_docids}}, {"$set": {"latest": False}}
+            )
+        except UnicodeEncodeError as e:
+            print(f"Unicode error on {page.url}")
+            self.collection.insert_one(unicode_error_document(page, page_result, e))
+        return True
+
+
+async def _in_thread(func: Callable[..., T], *args) -> T:
+    """Run a blocking function in the default executor without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args))
+
+
+def unicode_error_document(
+    page: Page, page_result: PageResult, error: UnicodeEncodeError
+) -> Dict:
+    """
+    Document to store in place of a page whose content can't be encoded.
+    """
+    document = page.to_dict()
+    # Set latest flag to false so we can still grab latest error-free version of
+    #   canonical link
+    document["latest"] = False
+    document.update(
+        {
+            "error_message": str(error),
+            "success": False,
+            "iso": page.sitemap_prov.sitemap.iso,
+            "language": page.sitemap_prov.sitemap.language,
+            "time_retrieved": page_result.time_retrieved,
+        }
+    )
+    return document
+
+
 async def insert_page(
-    collection: Collection,
+    writer: PageWriter,
     page_result: PageResult,
     *,
     html_tag_metadata: Dict,
@@ -385,93 +584,77 @@ async def insert_page(
     document["time_retrieved"] = page_result.time_retrieved
     document["error_message"] = page_result.error_message
     if page_result.success and document.get("canonical_link"):
-        existing_docids_in_language = []
-        parallel_url = None
-        for doc in collection.find({"canonical_link": document["canonical_link"]}):
-            if doc["iso"] == document["iso"]:
-                existing_docids_in_language.append(doc["_id"])
-            elif doc["latest"]:
-                parallel_url = doc["url"]
-        for doc in collection.find({"url": document["url"]}):
-            if doc["iso"] == document["iso"]:
-                existing_docids_in_language.append(doc["_id"])
-            elif doc["latest"]:
-                parallel_url = doc["url"]
-        document["parallel_url"] = parallel_url
-        existing_docids = list(set(existing_docids_in_language))
-        if existing_docids and document["success"]:
-            # Collision of canonical links, check and set latest if not an error
-            document["latest"] = True
-            try:
-                collection.insert_one(document)
-                collection.update_many(
-                    {"_id": {"$in": existing_docids}}, {"$set": {"latest": False}}
-                )
-            except UnicodeEncodeError as e:
-                print(f"Unicode error on {page.url}")
-                document = page.to_dict()
-                # Set latest flag to false so we can still grab latest error-free version of
-                #   canonical link
-                document["latest"] = False
-                document.update(
-                    {
-                        "error_message": str(e),
-                        "success": False,
-                        "iso": page.sitemap_prov.sitemap.iso,
-                        "language": page.sitemap_prov.sitemap.language,
-                        "time_retrieved": page_result.time_retrieved,
-                    }
-                )
-                collection.insert_one(document)
-        else:
-            await insert_without_deduplication(collection, document, page, page_result)
+        await writer.insert_deduplicated(document, page, page_result)
     else:
-        await insert_without_deduplication(collection, document, page, page_result)
+        await insert_without_deduplication(writer, document, page, page_result)
 
 
-async def insert_without_deduplication(collection, document, page, page_result):
-    # Insert document normally
-    try:
-        document["latest"] = True
-        collection.insert_one(document)
-    except UnicodeEncodeError as e:
-        print(f"Unicode error on {page.url}")
-        document = page.to_dict()
-        document["latest"] = False
-        document.update(
-            {
-                "error_message": str(e),
-                "success": False,
-                "iso": page.sitemap_prov.sitemap.iso,
-                "language": page.sitemap_prov.sitemap.language,
-                "time_retrieved": page_result.time_retrieved,
-            }
-        )
-        collection.insert_one(document)
+async def insert_without_deduplication(writer, document, page, page_result):
+    # Insert document normally, batched with other documents
+    document["latest"] = True
+    await writer.insert(document, page, page_result)
+
+
+def new_session() -> ClientSession:
+    connector = aiohttp.TCPConnector(limit_per_host=50)
+    return ClientSession(connector=connector)
 
 
 async def scrape_and_insert(
     sitemap_collection: Collection,
     pages_generator: Iterable[Page],
     num_connections: int = 8,
+    session: Optional[ClientSession] = None,
 ):
-    sem = asyncio.Semaphore(num_connections)
-    connector = aiohttp.TCPConnector(limit_per_host=50)
-    async with ClientSession(connector=connector) as session:
-        tasks = []
-        for page in pages_generator:
-            tasks.append(
-                asyncio.ensure_future(
-                    scrape_page(
-                        page,
-                        session=session,
-                        mongo_collection=sitemap_collection,
-                        sem=sem,
-                    )
-                )
+    """
+    Scrape every page and insert it into the collection.
+    Pass in a session to keep its connections and DNS cache across calls,
+    otherwise a new one is made just for these pages.
+    """
+    if session is None:
+        async with new_session() as session:
+            await scrape_and_insert(
+                sitemap_collection, pages_generator, num_connections, session
             )
-            # await asyncio.sleep(1)
+        return
+
+    writer = PageWriter(sitemap_collection)
+    # Pages are handed to a fixed set of workers through a bounded queue, so only a
+    # few pages per connection are held in memory instead of a task for every page
+    queue: asyncio.Queue = asyncio.Queue(
+        maxsize=num_connections * PAGES_QUEUED_PER_CONNECTION
+    )
+
+    async def produce():
+        for page in pages_generator:
+            await queue.put(page)
+        # One stop signal per worker
+        for _ in range(num_connections):
+            await queue.put(None)
+
+    async def work():
+        while True:
+            page = await queue.get()
+            if page is None:
+                return
+            await scrape_page(page, session=session, writer=writer)
+
+    # The producer is a task too, so an exception in a worker isn't left waiting on a
+    # full queue
+    tasks = [asyncio.ensure_future(produce())]
+    tasks.extend(asyncio.ensure_future(work()) for _ in range(num_connections))
+    try:
         await asyncio.gather(*tasks)
+    except BaseException:
+        # Still write the pages scraped before the failure, but raise the original error
+        # even if writing them fails too
+        try:
+            await writer.flush()
+        except Exception as flush_error:
+            print(f"Couldn't write buffered pages after scraping failed. {flush_error}")
+        raise
+    # Write whatever is left in the buffer
+    await writer.flush()
 
 
 @click.group()
@@ -506,24 +689,32 @@ def scrape(
         if choice.lower().startswith("y"):
             print("Dropping database...")
             client.drop_database(VOA_CORPUS)
-    voa_corpus = client.voa_corpus
-    sitemap_collection: Collection = voa_corpus.sitemaps
+    sitemap_collection = create_sitemap_collection(port)
+    # Indices are made first so deduplication lookups during the scrape use them
+    create_scrape_indices(sitemap_collection)
 
     sitemaps_by_language = read_filemap(filemap)
-    for lang in sitemaps_by_language:
-        if exclude_languages and lang in set(exclude_languages):
-            print(f"Skipping {lang}")
-            continue
-        if not languages or lang in set(languages):
-            pages_generator = pages_from_sitemaps(
-                sitemaps_by_language[lang], sitemap_dir
-            )
-            if doc_limit:
-                pages_generator = (p for p in list(pages_generator)[:doc_limit])
-            asyncio.run(
-                scrape_and_insert(sitemap_collection, pages_generator, num_connections)
-            )
-    create_scrape_indices(sitemap_collection)
+    wanted_languages = set(languages)
+    excluded_languages = set(exclude_languages)
+
+    async def scrape_languages():
+        # One session for all languages so connections to shared hosts are reused
+        async with new_session() as session:
+            for lang, sitemaps in sitemaps_by_language.items():
+                if lang in excluded_languages:
+                    print(f"Skipping {lang}")
+                    continue
+                if wanted_languages and lang not in wanted_languages:
+                    continue
+                pages_generator = pages_from_sitemaps(sitemaps, sitemap_dir)
+                if doc_limit:
+                    # Stop reading sitemaps once there are enough pages
+                    pages_generator = islice(pages_generator, doc_limit)
+                await scrape_and_insert(
+                    sitemap_collection, pages_generator, num_connections, session
+                )
+
+    asyncio.run(scrape_languages())
 
 
 def create_scrape_indices(sitemap_collection):
@@ -552,10 +743,10 @@ def read_pages_from_json(sitemap_diff_json_path: str) -> Generator[Page, None, N
 @click.option("--port", default=27200, type=int)
 @click.option("--num-connections", default=8, type=int)
 def update(sitemap_diff_json_path: str, port: int = 27200, num_connections: int = 8):
-    sitemap_collection = get_sitemap_collection(port)
+    sitemap_collection = create_sitemap_collection(port)
+    create_scrape_indices(sitemap_collection)
     pages_generator = read_pages_from_json(sitemap_diff_json_path)
     asyncio.run(scrape_and_insert(sitemap_collection, pages_generator, num_connections))
-    create_scrape_indices(sitemap_collection)
 
 
 @scraper_cli.command()
@@ -570,16 +761,22 @@ def scrape_waybacks(
     in case we wish to do anything more complicated with archive.org and the
     wayback machine later
     """
-    sitemap_collection = get_sitemap_collection(port)
-    for filepath in os.listdir(archive_pages_dir):
-        pages_generator = read_pages_from_json(
-            os.path.join(archive_pages_dir, filepath)
-        )
-        asyncio.run(
-            scrape_and_insert(sitemap_collection, pages_generator, num_connections)
-        )
+    sitemap_collection = create_sitemap_collection(port)
     create_scrape_indices(sitemap_collection)
 
+    async def scrape_all():
+        # One session for all the files so connections to the archive are reused
+        async with new_session() as session:
+            for filepath in os.listdir(archive_pages_dir):
+                pages_generator = read_pages_from_json(
+                    os.path.join(archive_pages_dir, filepath)
+                )
+                await scrape_and_insert(
+                    sitemap_collection, pages_generator, num_connections, session
+                )
+
+    asyncio.run(scrape_all())
+
 
 if __name__ == "__main__":
     scraper_cli()
@@ -1,28 +1,32 @@
 import re
 import sys
 from abc import ABC, abstractmethod
-from collections import namedtuple
 from io import StringIO
-from typing import Sequence, List, Optional, Generator
-
-import laonlp
-import pythainlp
-import razdel
-import stanza
-import torch
-import parsivar
-from amseg import AmharicSegmenter
-from attr import attrs
-from ersatz.candidates import (
-    MultilingualPunctuation,
-    Split,
-    PunctuationSpace,
-    AdditionalMultilingualPunctuation,
+from weakref import WeakValueDictionary
+from typing import (
+    TYPE_CHECKING,
+    Sequence,
+    Iterable,
+    List,
+    Optional,
+    Generator,
+    Tuple,
 )
-from ersatz.split import EvalModel
-from ersatz.utils import get_model_path
 
-from extraction.utils import SPACE_CHARS_STR
+from attr import attrs
+
+from extraction.utils import SPACE_CHARS_STR, BatchLRUCache
+
+# The backends for each language are imported when their segmenter is made, since most
+# processes only need a few of them. That includes torch and ersatz, which are only
+# loaded for languages segmented with ersatz.
+if TYPE_CHECKING:
+    import parsivar
+    import stanza
+    import torch
+    from amseg import AmharicSegmenter
+    from ersatz.candidates import Split
+    from ersatz.split import EvalModel
 
 SEGMENTABLE_LANGUAGES = {
     "amh",
@@ -75,18 +79,77 @@ CUSTOM_ERSATZ_MODELS = {
 
 SEGMENTABLE_LANGUAGES = SEGMENTABLE_LANGUAGES.union(CUSTOM_ERSATZ_MODELS)
 
+# Languages segmented with stanza, mapped to stanza's own language codes
+STANZA_LANGUAGE_CODES = {
+    "ell": "el",
+    "hye": "hy",
+    "ind": "id",
+    "kor": "ko",
+    "mya": "my",
+    "por": "pt",
+    "srp": "sr",
+    "ukr": "uk",
+    "urd": "ur",
+    "vie": "vi",
+}
+
 
 SPACE_CHAR_REGEX = re.compile(rf"[{SPACE_CHARS_STR}]")
 
+# Number of recently segmented texts each segmenter keeps the sentences of
+SEGMENT_CACHE_SIZE = 4096
+# Number of split candidates ersatz scores per forward pass
+ERSATZ_BATCH_SIZE = 16
+# Line put between texts segmented together by ersatz, so its output can be divided
+# back up per text. Has no punctuation, so ersatz never splits it.
+ERSATZ_TEXT_BREAK = "MOTERSATZTEXTBREAK"
+
+# Models that some segmenter or tokenizer is still using, so another one needing the same
+# model shares it instead of loading a copy. They are only held weakly. Keeping models
+# loaded is left to whoever holds the segmenters, so a model is freed along with the last
+# segmenter using it.
+_LOADED_ERSATZ_MODELS: "WeakValueDictionary[Tuple, EvalModel]" = WeakValueDictionary()
+_LOADED_STANZA_PIPELINES: "WeakValueDictionary[str, stanza.Pipeline]" = (
+    WeakValueDictionary()
+)
+
+
+def non_empty_stripped(sents: Iterable[str]) -> List[str]:
+    """Strip the sentences, dropping any left empty. Each one is only stripped once."""
+    return [sent for sent in map(str.strip, sents) if sent]
+
 
 class Segmenter(ABC):
     def __init__(self):
         self.language = "xx"
+        # Boilerplate paragraphs repeat across documents, so the sentences of recently
+        # segmented paragraphs are kept, as tuples since every lookup shares them
+        self._segment_cache: BatchLRUCache[str, Tuple[str, ...]] = BatchLRUCache(
+            SEGMENT_CACHE_SIZE
+        )
 
     @abstractmethod
     def segment(self, texts: str) -> List[str]:
         pass
 
+    def segment_batch(self, texts: Sequence[str]) -> List[List[str]]:
+        """
+        Segment several texts, like the paragraphs of a document.
+        Recently segmented texts are looked up, and the rest are segmented together.
+        """
+        sents = self._segment_cache.get_batch(texts, self._segment_as_tuples)
+        return [list(text_sents) for text_sents in sents]
+
+    def segment_batch_uncached(self, texts: Sequence[str]) -> List[List[str]]:
+        """
+        Segment several texts without looking them up.
+        Segmenters that can do this faster all at once override it.
+        """
+        return [self.segment(text) for text in texts]
+
+    def _segment_as_tuples(self, texts: Sequence[str]) -> List[Tuple[str, ...]]:
+        return [tuple(text_sents) for text_sents in self.segment_batch_uncached(texts)]
+
 
 class NaiveRomanSegmenter(Segmenter):
     """
@@ -100,9 +163,9 @@ class NaiveRomanSegmenter(Segmenter):
     Then split on usual rules.
     """
 
-    Candidate = namedtuple(
-        "Candidate", ("punct_idx", "end_idx", "left_token", "right_token")
-    )
+    # (punct_idx, end_idx, left_token, right_token), kept a plain tuple since one is
+    # made for every punctuation mark
+    Candidate = Tuple[int, int, Optional[str], Optional[str]]
     PUNCT = r"((\.+)|([!?]))"
     TARGET = re.compile(PUNCT + r"(([A-Za-z])|(\s*(['`\"”)}\]]*)|(\s+)))")
 
@@ -113,74 +176,60 @@ class NaiveRomanSegmenter(Segmenter):
         self.BUFFER = 20
 
     def _next_candidate(self, text: str) -> Generator[Candidate, None, None]:
-        for match in re.finditer(NaiveRomanSegmenter.TARGET, text):
-            if match.group(4).isalpha():
-                end_idx = match.end(4) - 1
-            else:
-                end_idx = match.end(4)
-            punct_idx = match.end(1) if match.group(1) else match.end(2)
-            if punct_idx == -1:
-                # Shouldn't be possible since each match should have one of the two punctuations
-                raise ValueError(
-                    f"Bad NaiveSegmenter candidate match in sent:\n {match.string}"
-                )
-            left_start = punct_idx - self.BUFFER
-            if left_start <= 0:
-                left_start = 0
-            left_context = text[left_start : punct_idx - 1].split()
-            right_context = text[end_idx : end_idx + self.BUFFER].split()
+        buffer = self.BUFFER
+        for match in NaiveRomanSegmenter.TARGET.finditer(text):
+            end_idx = match.end(4)
+            # A letter right after the punctuation starts the next sentence
+            if match.group(5):
+                end_idx -= 1
+            # The punctuation group always takes part in a match
+            punct_idx = match.end(1)
+            left_start = max(punct_idx - buffer, 0)
+            # Only the nearest token on each side is needed, so split off just that one
+            left_context = text[left_start : punct_idx - 1].rsplit(None, 1)
+            right_context = text[end_idx : end_idx + buffer].split(None, 1)
             # Pseudo tokens
             left_token = left_context[-1] if left_context else None
             right_token = right_context[0] if right_context else None
-            yield NaiveRomanSegmenter.Candidate(
-                punct_idx, end_idx, left_token, right_token
-            )
+            yield punct_idx, end_idx, left_token, right_token
 
     def segment(self, texts: str) -> List[str]:
         sents = []
         start = 0
-        for candidate in self._next_candidate(texts):
-            # Check explicitly for -Mnu Ndebele titles
-            # This has to be separate from other titles and abbreviations
-            # because Ndebele titles with prefixes can be longer than other langs
-            #  ex) nguMnu.
-            if candidate.left_token and candidate.left_token.endswith("Mnu"):
-                continue
-            # Skip splitting likely Prof. , Mr. etc ABC.
-            if (
-                candidate.left_token
-                and len(candidate.left_token) <= 4
-                # any chars contain upper for Ndebele uMnu.
-                and any(char.isupper() for char in candidate.left_token)
-            ):
-                continue
-
-            # Skip numeric things unless they look like a year (len of 4).
-            if (
-                candidate.left_token
-                and candidate.left_token.isdigit()
-                and len(candidate.left_token) != 4
-            ):
-                continue
-            if (
-                candidate.right_token
-                and candidate.right_token.isdigit()
-                and len(candidate.right_token) != 4
-            ):
-                continue
-            # Hacky way to stop splits on .. or ...
-            if candidate.left_token and candidate.left_token.endswith("."):
-                continue
-            # Too risky if sentence not capitalized after punctuation
-            if candidate.right_token and not candidate.right_token[0].isupper():
-                continue
-            new_sent = texts[start : candidate.end_idx]
+        # Unpacked so each token is a local instead of a tuple attribute lookup
+        for _, end_idx, left_token, right_token in self._next_candidate(texts):
+            if left_token:
+                # Check explicitly for -Mnu Ndebele titles
+                # This has to be separate from other titles and abbreviations
+                # because Ndebele titles with prefixes can be longer than other langs
+                #  ex) nguMnu.
+                # Also a hacky way to stop splits on .. or ...
+                if left_token.endswith(("Mnu", ".")):
+                    continue
+                # Skip splitting likely Prof. , Mr. etc ABC.
+                if (
+                    len(left_token) <= 4
+                    # any chars contain upper for Ndebele uMnu.
+                    and any(char.isupper() for char in left_token)
+                ):
+                    continue
+                # Skip numeric things unless they look like a year (len of 4).
+                if left_token.isdigit() and len(left_token) != 4:
+                    continue
+            if right_token:
+                # Skip numeric things unless they look like a year (len of 4).
+                if right_token.isdigit() and len(right_token) != 4:
+                    continue
+                # Too risky if sentence not capitalized after punctuation
+                if not right_token[0].isupper():
+                    continue
+            new_sent = texts[start:end_idx]
             if len(new_sent) < self.min_length:
                 continue
             stripped_new_sent = new_sent.strip()
             if stripped_new_sent:
                 sents.append(stripped_new_sent)
-                start = candidate.end_idx
+                start = end_idx
         if start <= len(texts):
             rest = texts[start:].strip()
             if rest.strip():
@@ -195,7 +244,9 @@ class TibetanNaiveSegmenter(Segmenter):
     ༅།། and །། shouldn't split. Everything other ། is fair game if not too short.
     """
 
-    Candidate = namedtuple("Candidate", ("punct_idx", "left", "right", "leftleft"))
+    # (punct_idx, left, right, leftleft), kept a plain tuple since one is made for
+    # every punctuation mark
+    Candidate = Tuple[int, Optional[str], Optional[str], Optional[str]]
 
     def __init__(self, min_length: int = 8):
         super(TibetanNaiveSegmenter, self).__init__()
@@ -205,32 +256,34 @@ class TibetanNaiveSegmenter(Segmenter):
             "\u0f0e",
         }  # TIBETAN MARK SHAD and TIBETAN MARK NYIS SHAD
         self.min_length = min_length
+        # Finds the punctuation in C rather than checking each character in Python
+        self.punct_regex = re.compile("[" + "".join(sorted(self.punct)) + "]")
 
     def _next_candidate(self, text: str) -> Generator[Candidate, None, None]:
-        for idx, ch in enumerate(text):
-            if ch in self.punct:
-                left = text[idx - 1] if idx - 1 > 0 else None
-                leftleft = text[idx - 2] if idx - 2 > 0 else None
-                right = text[idx + 1] if idx + 1 < len(text) else None
-                yield TibetanNaiveSegmenter.Candidate(idx, left, right, leftleft)
+        for match in self.punct_regex.finditer(text):
+            idx = match.start()
+            left = text[idx - 1] if idx - 1 > 0 else None
+            leftleft = text[idx - 2] if idx - 2 > 0 else None
+            right = text[idx + 1] if idx + 1 < len(text) else None
+            yield idx, left, right, leftleft
 
     def segment(self, texts: str) -> List[str]:
         sents = []
         start = 0
-        for candidate in self._next_candidate(texts):
-            new_sent = texts[start : candidate.punct_idx + 1]
+        for punct_idx, left, right, leftleft in self._next_candidate(texts):
+            new_sent = texts[start : punct_idx + 1]
             if (
                 len(new_sent) >= self.min_length
-                and candidate.left != "\u0f05"  # ༅ YIG MGO SGAB MA
-                and candidate.leftleft != "\u0f05"
-                and candidate.right not in self.punct
-                and (candidate.left is None or not candidate.left.isdigit())
-                and (candidate.right is None or not candidate.right.isdigit())
+                and left != "\u0f05"  # ༅ YIG MGO SGAB MA
+                and leftleft != "\u0f05"
+                and right not in self.punct
+                and (left is None or not left.isdigit())
+                and (right is None or not right.isdigit())
             ):
                 stripped_new_sent = new_sent.strip()
                 if stripped_new_sent:
                     sents.append(stripped_new_sent)
-                    start = candidate.punct_idx + 1
+                    start = punct_idx + 1
         if start <= len(texts):
             rest = texts[start:].strip()
             if rest.strip():
@@ -252,37 +305,42 @@ class StanzaSegmenter(Segmenter):
         doc = self.nlp(text)
         return [sentence.text for sentence in doc.sentences]
 
+    def segment_batch_uncached(self, texts: Sequence[str]) -> List[List[str]]:
+        """
+        Segment the texts as separate documents in one pipeline call, so stanza runs
+        them through its model in shared batches.
+        """
+        from stanza import Document
+
+        docs = self.nlp([Document([], text=text) for text in texts])
+        return [[sentence.text for sentence in doc.sentences] for doc in docs]
+
     def tokenize(self, text: str):
         doc = self.nlp(text)
         return [token.text for sentence in doc.sentences for token in sentence.words]
 
     @staticmethod
     def load_model(stanza_lang: str):
-        stanza.download(stanza_lang, processors="tokenize")
-        return stanza.Pipeline(stanza_lang, processors="tokenize", use_gpu=False)
+        # The segmenter and tokenizer for a language share one pipeline
+        pipeline = _LOADED_STANZA_PIPELINES.get(stanza_lang)
+        if pipeline is None:
+            # Only downloads the model if it isn't there yet, rather than checking online
+            # every time a pipeline is made
+            import stanza
+
+            pipeline = stanza.Pipeline(
+                stanza_lang,
+                processors="tokenize",
+                use_gpu=False,
+                download_method=stanza.DownloadMethod.REUSE_RESOURCES,
+            )
+            _LOADED_STANZA_PIPELINES[stanza_lang] = pipeline
+        return pipeline
 
     @staticmethod
     def setup_stanza(lang: str):
-        if lang == "hye":
-            return StanzaSegmenter.load_model("hy")
-        elif lang == "ell":
-            return StanzaSegmenter.load_model("el")
-        elif lang == "ind":
-            return StanzaSegmenter.load_model("id")
-        elif lang == "kor":
-            return StanzaSegmenter.load_model("ko")
-        elif lang == "mya":
-            return StanzaSegmenter.load_model("my")
-        elif lang == "srp":
-            return StanzaSegmenter.load_model("sr")
-        elif lang == "por":
-            return StanzaSegmenter.load_model("pt")
-        elif lang == "ukr":
-            return StanzaSegmenter.load_model("uk")
-        elif lang == "urd":
-            return StanzaSegmenter.load_model("ur")
-        elif lang == "vie":
-            return StanzaSegmenter.load_model("vi")
+        if lang in STANZA_LANGUAGE_CODES:
+            return StanzaSegmenter.load_model(STANZA_LANGUAGE_CODES[lang])
         else:
             raise ValueError("We aren't setup to use this language with stanza")
 
@@ -295,12 +353,13 @@ class LaoSegmenter(Segmenter):
     def __init__(self):
         super().__init__()
         self.language = "lao"
+        import laonlp
+
+        self.sent_tokenize = laonlp.tokenize.sent_tokenize
 
     def segment(self, text: str) -> List[str]:
         text = SPACE_CHAR_REGEX.sub("", text)
-        return [
-            sent.strip() for sent in laonlp.tokenize.sent_tokenize(text) if sent.strip()
-        ]
+        return non_empty_stripped(self.sent_tokenize(text))
 
 
 class RussianSegmenter(Segmenter):
@@ -311,10 +370,13 @@ class RussianSegmenter(Segmenter):
     def __init__(self):
         super().__init__()
         self.language = "rus"
+        import razdel
+
+        self.sentenize = razdel.sentenize
 
     def segment(self, rus_str: str) -> List[str]:
         # Razdel does have offsets in its output if we need them later
-        return [sent.text for sent in razdel.sentenize(rus_str)]
+        return [sent.text for sent in self.sentenize(rus_str)]
 
 
 class PersianSegmenter(Segmenter):
@@ -322,6 +384,11 @@ class PersianSegmenter(Segmenter):
     Persian segmenter using Parsivar. Note: Also does normalization..
     """
 
+    # Parsivar's normalizer and tokenizer hold no per-text state, so fas and prs
+    # segmenters and tokenizers all share a single pair
+    _normalizer: Optional["parsivar.Normalizer"] = None
+    _tokenizer: Optional["parsivar.Tokenizer"] = None
+
     def __init__(self, lang: str):
         super().__init__()
         assert lang in {
@@ -329,8 +396,16 @@ class PersianSegmenter(Segmenter):
             "prs",
         }, f"Can't use Parsivar for non persian language {lang}"
         self.language = lang
-        self.normalizer = parsivar.Normalizer()
-        self.tokenizer = parsivar.Tokenizer()
+        self.normalizer, self.tokenizer = PersianSegmenter.parsivar_tools()
+
+    @classmethod
+    def parsivar_tools(cls) -> Tuple["parsivar.Normalizer", "parsivar.Tokenizer"]:
+        if cls._normalizer is None or cls._tokenizer is None:
+            import parsivar
+
+            cls._normalizer = parsivar.Normalizer()
+            cls._tokenizer = parsivar.Tokenizer()
+        return cls._normalizer, cls._tokenizer
 
     def segment(self, fas_str: str) -> List[str]:
         return self.tokenizer.tokenize_sentences(self.normalizer.normalize(fas_str))
@@ -344,14 +419,13 @@ class ThaiSegmenter(Segmenter):
     def __init__(self):
         super().__init__()
         self.language = "tha"
+        import pythainlp
+
+        self.sent_tokenize = pythainlp.tokenize.sent_tokenize
 
     def segment(self, thai_str: str) -> List[str]:
         thai_str = SPACE_CHAR_REGEX.sub("", thai_str)
-        return [
-            sent.strip()
-            for sent in pythainlp.tokenize.sent_tokenize(thai_str)
-            if sent.strip()
-        ]
+        return non_empty_stripped(self.sent_tokenize(thai_str))
 
 
 class GeezSegmenter(Segmenter):
@@ -365,7 +439,9 @@ class GeezSegmenter(Segmenter):
         sent_punct: List = []
         word_punct: List = []
         self.language = language
-        self.segmenter: AmharicSegmenter = AmharicSegmenter(sent_punct, word_punct)
+        from amseg import AmharicSegmenter
+
+        self.segmenter: "AmharicSegmenter" = AmharicSegmenter(sent_punct, word_punct)
 
     def segment(self, geez_str: str) -> List[str]:
         return self.segmenter.tokenize_sentence(geez_str)
@@ -373,8 +449,8 @@ class GeezSegmenter(Segmenter):
 
 @attrs(auto_attribs=True)
 class ErsatzModel:
-    model: EvalModel
-    candidates: Split
+    model: "EvalModel"
+    candidates: "Split"
 
 
 class ErsatzSegmenter(Segmenter):
@@ -383,30 +459,87 @@ class ErsatzSegmenter(Segmenter):
     """
 
     def __init__(
-        self, iso: str = "xx", cuda_id: Optional[int] = None, use_gpu: bool = False
+        self,
+        iso: str = "xx",
+        cuda_id: Optional[int] = None,
+        use_gpu: bool = False,
+        batch_size: int = ERSATZ_BATCH_SIZE,
+        dtype: Optional["torch.dtype"] = None,
+        compile_model: bool = False,
     ):
         super().__init__()
         self.language = iso
+        self.batch_size = batch_size
         self.ersatz_model: ErsatzModel = ErsatzSegmenter.setup_ersatz(
-            iso, cuda_id, use_gpu=use_gpu
+            iso, cuda_id, use_gpu=use_gpu, dtype=dtype, compile_model=compile_model
         )
 
     def segment(self, text: str) -> List[str]:
         text = SPACE_CHAR_REGEX.sub("", text)
-        return [sent.strip() for sent in self.run_ersatz([text]) if sent.strip()]
+        return non_empty_stripped(self.run_ersatz([text]))
+
+    def segment_batch_uncached(self, texts: Sequence[str]) -> List[List[str]]:
+        """
+        Segment all the texts with a single call to ersatz, so the model sees full batches
+        instead of a few candidates per text.
+        """
+        if not texts:
+            return []
+        lines = []
+        for text in texts:
+            if lines:
+                lines.append(ERSATZ_TEXT_BREAK)
+            lines.append(SPACE_CHAR_REGEX.sub("", text))
+        segmented: List[List[str]] = [[]]
+        for sent in self.run_ersatz(lines):
+            sent = sent.strip()
+            if sent == ERSATZ_TEXT_BREAK:
+                segmented.append([])
+            elif sent:
+                segmented[-1].append(sent)
+        if len(segmented) != len(texts):
+            # A break line got lost somewhere, so fall back to one text at a time
+            return [self.segment(text) for text in texts]
+        return segmented
 
     def run_ersatz(self, texts: Sequence[str]) -> List[str]:
+        import torch
+
         output_file = StringIO()
-        output_file = self.ersatz_model.model.split(
-            texts, output_file, 16, candidates=self.ersatz_model.candidates
-        )
+        # No gradients are needed, so skip autograd's bookkeeping entirely
+        with torch.inference_mode():
+            output_file = self.ersatz_model.model.split(
+                texts,
+                output_file,
+                self.batch_size,
+                candidates=self.ersatz_model.candidates,
+            )
         sents = output_file.getvalue().strip().split("\n")
         return sents
 
     @staticmethod
     def setup_ersatz(
-        iso: str, cuda_id: Optional[int] = None, use_gpu=False
+        iso: str,
+        cuda_id: Optional[int] = None,
+        use_gpu=False,
+        dtype: Optional["torch.dtype"] = None,
+        compile_model: bool = False,
     ) -> ErsatzModel:
+        """
+        Load the ersatz model for a language onto the cpu or gpu.
+        If dtype isn't given, models are run in half precision on a gpu and full
+        precision on the cpu.
+        compile_model runs the model through torch.compile, which makes the first
+        batches slow but cuts per-op overhead after that. Needs torch 2.
+        """
+        import torch
+        from ersatz.candidates import (
+            MultilingualPunctuation,
+            PunctuationSpace,
+            AdditionalMultilingualPunctuation,
+        )
+        from ersatz.utils import get_model_path
+
         # Load model manually
         # Use model to split sentences
         if iso == "eng":
@@ -417,7 +550,7 @@ class ErsatzSegmenter(Segmenter):
             candidates = MultilingualPunctuation()
         if use_gpu:
             if torch.cuda.is_available():
-                if cuda_id:
+                if cuda_id is not None:
                     device = torch.device(f"cuda:{cuda_id}")
                 else:
                     device = torch.device("cuda")
@@ -446,11 +579,40 @@ class ErsatzSegmenter(Segmenter):
             model_path = get_model_path("default-multilingual")
         else:
             model_path = get_model_path("default-multilingual")
-        model = EvalModel(model_path)
+        if dtype is None:
+            dtype = torch.float16 if device.type == "cuda" else torch.float32
+        return ErsatzModel(
+            load_ersatz_model(model_path, device, dtype, compile_model), candidates
+        )
 
-        model.model = model.model.to(device)
-        model.device = device
-        return ErsatzModel(model, candidates)
+
+def load_ersatz_model(
+    model_path: str,
+    device: "torch.device",
+    dtype: "torch.dtype",
+    compile_model: bool = False,
+) -> "EvalModel":
+    """
+    Load ersatz weights onto a device. A model already loaded for another segmenter is
+    reused, since many languages share the multilingual model.
+    """
+    key = (model_path, device, dtype, compile_model)
+    model = _LOADED_ERSATZ_MODELS.get(key)
+    if model is not None:
+        return model
+
+    import torch
+    from ersatz.split import EvalModel
+
+    model = EvalModel(model_path)
+    model.model = model.model.to(device=device, dtype=dtype)
+    if compile_model:
+        # CUDA graphs remove most of the kernel launch overhead on a gpu
+        mode = "reduce-overhead" if device.type == "cuda" else "default"
+        model.model = torch.compile(model.model, mode=mode)
+    model.device = device
+    _LOADED_ERSATZ_MODELS[key] = model
+    return model
 
 
 def setup_segmenter(
@@ -473,25 +635,7 @@ def setup_segmenter(
         return RussianSegmenter()
     elif iso == "lao":
         return LaoSegmenter()
-    elif iso == "hye":
-        return StanzaSegmenter(iso)
-    elif iso == "por":
-        return StanzaSegmenter(iso)
-    elif iso == "ell":
-        return StanzaSegmenter(iso)
-    elif iso == "ind":
-        return StanzaSegmenter(iso)
-    elif iso == "kor":
-        return StanzaSegmenter(iso)
-    elif iso == "srp":
-        return StanzaSegmenter(iso)
-    elif iso == "ukr":
-        return StanzaSegmenter(iso)
-    elif iso == "urd":
-        return StanzaSegmenter(iso)
-    elif iso == "vie":
-        return StanzaSegmenter(iso)
-    elif iso == "mya":
+    elif iso in STANZA_LANGUAGE_CODES:
         return StanzaSegmenter(iso)
     elif iso == "bod":
         return TibetanNaiveSegmenter()
@@ -1,24 +1,20 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Callable
-
-import laonlp
-import parsivar
-import pythainlp
-import razdel
-
-from amseg import AmharicSegmenter
-from spacy.lang.en import English
-from spacy.lang.es import Spanish
-from spacy.lang.fr import French
-from spacy.lang.ru import Russian
-from spacy.lang.tr import Turkish
-from spacy.lang.xx import MultiLanguage
-from spacy.lang.zh import Chinese
-from spacy.tokenizer import Tokenizer
+from functools import partial
+from importlib import import_module
+from typing import TYPE_CHECKING, Dict, List, Optional, Callable, Sequence, Tuple
+
 from utoken import utokenize
 
-from extraction.segmentation import StanzaSegmenter
-from extraction.utils import SPACE_CHARS_STR
+from extraction.segmentation import (
+    STANZA_LANGUAGE_CODES,
+    PersianSegmenter,
+    StanzaSegmenter,
+)
+from extraction.utils import SPACE_CHARS_STR, BatchLRUCache
+
+# spacy's language classes are imported when a tokenizer for them is made
+if TYPE_CHECKING:
+    from spacy.tokenizer import Tokenizer
 
 
 TOKENIZABLE_LANGUAGES = {
@@ -71,6 +67,21 @@ UTOKEN_TOKENIZABLE = {
 
 TOKENIZABLE_LANGUAGES = TOKENIZABLE_LANGUAGES.union(UTOKEN_TOKENIZABLE)
 
+# Languages tokenized with spacy, mapped to the module and name of their language class.
+# Any other language uses spacy's multi-language class.
+SPACY_LANGUAGE_CLASSES = {
+    "eng": ("spacy.lang.en", "English"),
+    "cmn": ("spacy.lang.zh", "Chinese"),
+    "fra": ("spacy.lang.fr", "French"),
+    "spa": ("spacy.lang.es", "Spanish"),
+    "rus": ("spacy.lang.ru", "Russian"),
+    "tur": ("spacy.lang.tr", "Turkish"),
+}
+SPACY_MULTI_LANGUAGE_CLASS = ("spacy.lang.xx", "MultiLanguage")
+
+# Number of recently tokenized sentences each tokenizer keeps the tokens of
+TOKEN_CACHE_SIZE = 16384
+
 
 def load_khmernltk() -> Callable:
     from khmernltk import word_tokenize as khmer_tokenize
@@ -85,6 +96,10 @@ class BaseTokenizer(ABC):
 
     def __init__(self):
         self.language = "xx"
+        # Titles, captions and boilerplate sentences repeat across documents
+        self._token_cache: BatchLRUCache[str, Tuple[str, ...]] = BatchLRUCache(
+            TOKEN_CACHE_SIZE
+        )
 
     @abstractmethod
     def tokenize(self, text: str) -> List[str]:
@@ -93,6 +108,17 @@ class BaseTokenizer(ABC):
         """
         pass
 
+    def tokenize_batch(self, texts: Sequence[str]) -> List[List[str]]:
+        """
+        Tokenize several sentences, like those of a paragraph.
+        Sentences tokenized recently are looked up instead of tokenized again.
+        """
+        tokens = self._token_cache.get_batch(texts, self._tokenize_as_tuples)
+        return [list(sent_tokens) for sent_tokens in tokens]
+
+    def _tokenize_as_tuples(self, texts: Sequence[str]) -> List[Tuple[str, ...]]:
+        return [tuple(self.tokenize(text)) for text in texts]
+
 
 class StanzaTokenizer(BaseTokenizer):
     """
@@ -135,11 +161,14 @@ class LaoTokenizer(BaseTokenizer):
     def __init__(self):
         super().__init__()
         self.language = "lao"
+        import laonlp
+
+        self.word_tokenize = laonlp.tokenize.word_tokenize
 
     def tokenize(self, text: str) -> List[str]:
         return [
             token.strip().strip(SPACE_CHARS_STR)
-            for token in laonlp.tokenize.word_tokenize(text)
+            for token in self.word_tokenize(text)
             if token.strip().strip(SPACE_CHARS_STR)
         ]
 
@@ -152,10 +181,13 @@ class RussianTokenizer(BaseTokenizer):
     def __init__(self):
         super().__init__()
         self.language = "rus"
+        import razdel
+
+        self.razdel_tokenize = razdel.tokenize
 
     def tokenize(self, text: str) -> List[str]:
         # Razdel provides offsets if we go that route later.
-        return [token.text for token in razdel.tokenize(text)]
+        return [token.text for token in self.razdel_tokenize(text)]
 
 
 class PersianTokenizer(BaseTokenizer):
@@ -171,7 +203,7 @@ class PersianTokenizer(BaseTokenizer):
             "prs",
         }, f"Can't use Parsivar for non persian language {lang}"
         self.language = lang
-        self.tokenizer = parsivar.Tokenizer()
+        _, self.tokenizer = PersianSegmenter.parsivar_tools()
 
     def tokenize(self, text: str) -> List[str]:
         # Assumes text is already normalized by sentence splitting.
@@ -187,11 +219,14 @@ class ThaiTokenizer(BaseTokenizer):
     def __init__(self):
         super().__init__()
         self.language = "tha"
+        import pythainlp
+
+        self.word_tokenize = pythainlp.tokenize.word_tokenize
 
     def tokenize(self, text: str) -> List[str]:
         return [
             token.strip().strip(SPACE_CHARS_STR)
-            for token in pythainlp.tokenize.word_tokenize(text)
+            for token in self.word_tokenize(text)
             if token.strip().strip(SPACE_CHARS_STR)
         ]
 
@@ -202,6 +237,8 @@ class GeezTokenizer(BaseTokenizer):
         self.language = iso
         sent_punct: List = []
         word_punct: List = []
+        from amseg import AmharicSegmenter
+
         self.segmenter = AmharicSegmenter(sent_punct, word_punct)
 
     def tokenize(self, text: str) -> List[str]:
@@ -248,89 +285,58 @@ class SpacyTokenizer(BaseTokenizer):
     def __init__(self, lang_code: Optional[str] = None):
         super().__init__()
         self.language = lang_code if lang_code else "xx"
-        if lang_code == "eng":
-            self.tokenizer = English().tokenizer
-        elif lang_code == "cmn":
-            zh_nlp = Chinese.from_config(
+        module_name, class_name = SPACY_LANGUAGE_CLASSES.get(
+            self.language, SPACY_MULTI_LANGUAGE_CLASS
+        )
+        language_class = getattr(import_module(module_name), class_name)
+        if lang_code == "cmn":
+            zh_nlp = language_class.from_config(
                 {"nlp": {"tokenizer": {"segmenter": "pkuseg"}}}
             )
             # Weirdness in spacy type hints
             zh_nlp.tokenizer.initialize(pkuseg_model="mixed")  # type: ignore
             self.tokenizer = zh_nlp.tokenizer
-        elif lang_code == "fra":
-            self.tokenizer = French().tokenizer
-        elif lang_code == "spa":
-            self.tokenizer = Spanish().tokenizer
-        elif lang_code == "rus":
-            self.tokenizer = Russian().tokenizer
-        elif lang_code == "tur":
-            self.tokenizer = Turkish().tokenizer
         else:
-            self.tokenizer = MultiLanguage().tokenizer
+            self.tokenizer = language_class().tokenizer
 
     def tokenize(self, text: str) -> List[str]:
         tokens = self.tokenizer(text)
         return [t.text for t in tokens]
 
 
+# Functions making the tokenizer for each language. Languages without one use spacy's
+# multi-language tokenizer.
+TOKENIZER_FACTORIES: Dict[str, Callable[[], BaseTokenizer]] = {
+    "eng": partial(SpacyTokenizer, "eng"),
+    "cmn": partial(SpacyTokenizer, "cmn"),
+    "fra": partial(SpacyTokenizer, "fra"),
+    "spa": partial(SpacyTokenizer, "spa"),
+    # Razdel is also available with RussianTokenizer, but spacy has always been used
+    "rus": partial(SpacyTokenizer, "rus"),
+    "tur": partial(SpacyTokenizer, "tur"),
+    "tha": ThaiTokenizer,
+    "amh": partial(GeezTokenizer, "amh"),
+    "tir": partial(GeezTokenizer, "tir"),
+    "fas": partial(PersianTokenizer, "fas"),
+    "prs": partial(PersianTokenizer, "prs"),
+    "lao": LaoTokenizer,
+    "khm": KhmerTokenizer,
+    "bod": TibetanTokenizer,
+}
+TOKENIZER_FACTORIES.update(
+    (iso, partial(StanzaTokenizer, iso)) for iso in STANZA_LANGUAGE_CODES
+)
+TOKENIZER_FACTORIES.update(
+    (iso, partial(UTokenizer, lang=iso)) for iso in UTOKEN_TOKENIZABLE
+)
+
+
 def setup_tokenizer(iso: str = "xx") -> BaseTokenizer:
-    if iso == "eng":
-        return SpacyTokenizer("eng")
-    elif iso == "cmn":
-        return SpacyTokenizer("cmn")
-    elif iso == "fra":
-        return SpacyTokenizer("fra")
-    elif iso == "spa":
-        return SpacyTokenizer("spa")
-    elif iso == "rus":
-        return SpacyTokenizer("rus")
-    elif iso == "tur":
-        return SpacyTokenizer("tur")
-    elif iso == "tha":
-        return ThaiTokenizer()
-    elif iso == "amh":
-        return GeezTokenizer("amh")
-    elif iso == "tir":
-        return GeezTokenizer("tir")
-    elif iso == "fas":
-        return PersianTokenizer(iso)
-    elif iso == "prs":
-        return PersianTokenizer(iso)
-    elif iso == "rus":
-        return RussianTokenizer()
-    elif iso == "lao":
-        return LaoTokenizer()
-    elif iso == "hye":
-        return StanzaTokenizer(iso)
-    elif iso == "ell":
-        return StanzaTokenizer(iso)
-    elif iso == "ind":
-        return StanzaTokenizer(iso)
-    elif iso == "kor":
-        return StanzaTokenizer(iso)
-    elif iso == "por":
-        return StanzaTokenizer(iso)
-    elif iso == "srp":
-        return StanzaTokenizer(iso)
-    elif iso == "ukr":
-        return StanzaTokenizer(iso)
-    elif iso == "urd":
-        return StanzaTokenizer(iso)
-    elif iso == "vie":
-        return StanzaTokenizer(iso)
-    elif iso == "mya":
-        return StanzaTokenizer(iso)
-    elif iso == "khm":
-        return KhmerTokenizer()
-    elif iso == "bod":
-        return TibetanTokenizer()
-    elif iso in UTOKEN_TOKENIZABLE:
-        return UTokenizer(lang=iso)
-    else:
-        return SpacyTokenizer()
-
-
-def tokenize(sent: str, tokenizer: Tokenizer) -> List[str]:
+    factory = TOKENIZER_FACTORIES.get(iso)
+    return factory() if factory is not None else SpacyTokenizer()
+
+
+def tokenize(sent: str, tokenizer: "Tokenizer") -> List[str]:
     tokens = tokenizer(sent)
     return [t.text for t in tokens]
 
@@ -1,17 +1,43 @@
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Callable, Dict, Generic, Hashable, List, Optional, Sequence, TypeVar
 
 from pymongo import MongoClient
 from pymongo.collection import Collection
+from pymongo.errors import CollectionInvalid
 
 
 ARCHIVEDOTORG = "archive.org"
 
 
+SITEMAPS_COLLECTION = "sitemaps"
+# Scraped pages are stored with their full html, which compresses well on disk
+SITEMAPS_STORAGE_ENGINE = {"wiredTiger": {"configString": "block_compressor=zstd"}}
+
+
 def get_sitemap_collection(port: int = 27200) -> Collection:
     client = MongoClient(port=port)
     voa_corpus = client.voa_corpus
-    return voa_corpus.sitemaps
+    return voa_corpus[SITEMAPS_COLLECTION]
+
+
+def create_sitemap_collection(port: int = 27200) -> Collection:
+    """
+    Get the collection of scraped pages for writing to.
+    If it doesn't exist yet, it's created with zstd block compression, which needs
+    MongoDB 4.2 or later. Reads are unaffected, it's decompressed by the server.
+    """
+    client = MongoClient(port=port)
+    voa_corpus = client.voa_corpus
+    if SITEMAPS_COLLECTION not in voa_corpus.list_collection_names():
+        try:
+            return voa_corpus.create_collection(
+                SITEMAPS_COLLECTION, storageEngine=SITEMAPS_STORAGE_ENGINE
+            )
+        except CollectionInvalid:
+            # Someone else created it in the meantime
+            pass
+    return voa_corpus[SITEMAPS_COLLECTION]
 
 
 SPACE_CHARS = {
@@ -24,6 +50,50 @@ SPACE_CHARS = {
 }
 SPACE_CHARS_STR = "".join(SPACE_CHARS)
 
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BatchLRUCache(Generic[K, V]):
+    """
+    Least recently used cache for values computed a batch at a time, like the sentences
+    of each paragraph of a document.
+    Unlike functools.lru_cache on a method, it holds no reference to the object that owns
+    it. An owner dropped from a model cache is freed right away instead of waiting for the
+    garbage collector to break a reference cycle, along with its model.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[K, V]" = OrderedDict()
+
+    def get_batch(
+        self, keys: Sequence[K], compute: Callable[[List[K]], Sequence[V]]
+    ) -> List[V]:
+        """
+        Look up the value of every key. Keys that aren't cached are passed to compute
+        together, once each, and their values are cached.
+        """
+        values: Dict[K, V] = {}
+        # A dict rather than a set, to keep the keys in order
+        missing: Dict[K, None] = {}
+        for key in keys:
+            if key in values or key in missing:
+                continue
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                values[key] = self._entries[key]
+            else:
+                missing[key] = None
+        if missing:
+            missing_keys = list(missing)
+            for key, value in zip(missing_keys, compute(missing_keys)):
+                values[key] = value
+                self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return [values[key] for key in keys]
+
 
 def get_publication_date_from_utag(utag_data: Dict) -> Optional[str]:
     """
@@ -1,15 +1,20 @@
 import os
-import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 from pathlib import Path
 from typing import Counter, List, Tuple
 
 import click
+import orjson
 
 UNIT_PARAGRAPHS = "paragraphs"
 UNIT_SENTENCES = "sentences"
 UNIT_TOKENS = "tokens"
 VALID_UNITS = (UNIT_PARAGRAPHS, UNIT_SENTENCES, UNIT_TOKENS)
 VALID_CONTENT_TYPES = ("article", "audio", "photo", "video")
+# Number of files sent to an extract worker at a time
+EXTRACT_CHUNKSIZE = 64
 
 
 @click.group()
@@ -49,6 +54,12 @@ def cli() -> None:
     "--include-authors", is_flag=True,
     help="whether to include the authors at the top of the text file. (default: false)",
 )
+@click.option(
+    "--n-workers",
+    default=1,
+    type=int,
+    help="number of processes to extract files with, 0 for one per cpu (default: 1)",
+)
 def extract(
     units: str,
     source: Path,
@@ -58,6 +69,7 @@ def extract(
     types: str = "",
     include_title: bool = False,
     include_authors: bool = False,
+    n_workers: int = 1,
 ) -> None:
     """Extract json documents into text files in the output directory.\n
     Parameters\n
@@ -78,6 +90,8 @@ def extract(
         boolean value of whether to include the title at the top of each file\n
     include_authors : boolean, optional\n
         boolean value of whether to include the authors at the top of each file\n
+    n_workers : int, optional\n
+        the number of processes to extract files from a directory with, one per cpu if 0 (default: 1)\n
 
     Raises\n
     ------\n
@@ -114,28 +128,48 @@ def extract(
         # If the user gives types, we use those. If not, we look at all subdirectories of the source
         # directory
         os.makedirs(output_dir, exist_ok=True)
-        files_extracted = 0
+        # Collect the files first so they can be extracted in parallel. Every file counts
+        # towards max_files, but only json files are extracted.
+        json_files: List[Path] = []
+        json_content_types: List[str] = []
+        files_listed = 0
         for content_type in content_types:
             cur_dir = Path(source) / Path(content_type)
             files = _list_files(cur_dir)
             output_type_dir = Path(output_dir) / Path(content_type)
             output_type_dir.mkdir(exist_ok=True)
+            if max_files:
+                files = files[: max_files - files_listed]
+            files_listed += len(files)
             for file in files:
-                if max_files and files_extracted >= max_files:
-                    break
                 filetype = os.path.splitext(file)[-1]
                 if filetype == ".json":
-                    data = _read_json(file)
-                    _make_text_file(
-                        output_dir,
-                        content_type,
-                        data,
-                        include_title,
-                        include_authors,
-                        units,
-                        max_per_file,
-                    )
-                files_extracted += 1
+                    json_files.append(file)
+                    json_content_types.append(content_type)
+
+        extract_file = partial(
+            _extract_file,
+            output_dir=output_dir,
+            include_title=include_title,
+            include_authors=include_authors,
+            units=units,
+            max_per_file=max_per_file,
+        )
+        if n_workers == 1:
+            # Extract in this process, without starting a pool
+            for file, content_type in zip(json_files, json_content_types):
+                extract_file(file, content_type)
+            return
+        # A max_workers of None uses one process per cpu
+        with ProcessPoolExecutor(max_workers=n_workers or None) as executor:
+            # Consume the results so exceptions in workers are raised here
+            for _ in executor.map(
+                extract_file,
+                json_files,
+                json_content_types,
+                chunksize=EXTRACT_CHUNKSIZE,
+            ):
+                pass
 
 
 @click.argument("keyword")
@@ -218,14 +252,11 @@ def _extract_filtered(
 ) -> None:
     """This is a helper function for extract, it only acts when there is a filter file input for source."""
     os.makedirs(output_dir, exist_ok=True)
-    num_extracted = 0
     with open(source, encoding="utf8") as f:
-        contents = f.readlines()
-        for line in contents:  # Checks each line of the text file for a path
-            if num_files and num_extracted >= num_files:
-                break
-            line = line.rstrip("\n")
-            data = _read_json(Path(line))
+        # Each line of the text file is a path. Only as many lines as will be extracted
+        # are read, and a num_files of 0 reads them all.
+        for line in islice(f, num_files or None):
+            data = _read_json(Path(line.rstrip("\n")))
             _make_text_file(
                 output_dir,
                 content_type,
@@ -235,13 +266,35 @@ def _extract_filtered(
                 units,
                 max_per_file,
             )
-            num_extracted += 1
+
+
+def _extract_file(
+    file: Path,
+    content_type: str,
+    output_dir: Path,
+    include_title: bool,
+    include_authors: bool,
+    units: str,
+    max_per_file: int,
+) -> None:
+    """Extracts a single json file to text. Run in worker processes by extract."""
+    data = _read_json(file)
+    _make_text_file(
+        output_dir,
+        content_type,
+        data,
+        include_title,
+        include_authors,
+        units,
+        max_per_file,
+    )
 
 
 def _read_json(filename: Path) -> dict:
     """Reads a json file, outputting a dictionary-like of the information about the object"""
-    with open(filename, "r", encoding="utf8") as read_file:
-        data = json.load(read_file)
+    # orjson decodes the utf8 bytes itself, so the file is read without decoding
+    with open(filename, "rb") as read_file:
+        data = orjson.loads(read_file.read())
     return data
 
 
@@ -273,16 +326,16 @@ def _make_text_file(
 
         print_title = include_title and title
         if print_title:
-            print(title, file=text_file)
+            text_file.write(title + "\n")
 
         print_authors = include_authors and authors
         if print_authors:
-            for author in authors:
-                print(author, file=text_file)  # Prints each author on a new line
+            # Each author on a new line
+            text_file.writelines(author + "\n" for author in authors)
 
         # Print blank link after title and/or authors if needed
         if print_title or print_authors:
-            print(file=text_file)
+            text_file.write("\n")
 
         if units == UNIT_TOKENS:
             # Some files don't have tokenization. This should be consistent within a language, so
@@ -298,40 +351,44 @@ def _make_text_file(
             for paragraph in tokens:
                 # The token field is composed of lists representing paragraphs composed of lists
                 # representing sentences.
-                for sentence in paragraph:
-                    print(" ".join(sentence), file=text_file)
-                    processed += 1
-                    if max_per_file and processed >= max_per_file:
-                        return
+                if max_per_file:
+                    paragraph = paragraph[: max_per_file - processed]
+                    processed += len(paragraph)
+                # Each paragraph is written in one call rather than a print per sentence
+                text_file.writelines(
+                    " ".join(sentence) + "\n" for sentence in paragraph
+                )
+                if max_per_file and processed >= max_per_file:
+                    return
                 # Blank line between paragraphs
-                print(file=text_file)
+                text_file.write("\n")
         elif units == UNIT_SENTENCES:
             # TODO: Handle not having sentences
             for paragraph in data["sentences"]:
                 # The sentence field is composed of lists representing paragraphs containing lists
                 # representing sentences.
-                for sentence in paragraph:
-                    print(sentence, file=text_file)
-                    processed += 1
-                    if max_per_file and processed >= max_per_file:
-                        return
-                # Blank line between paragraphs
-                print(file=text_file)
-        elif units == UNIT_PARAGRAPHS:
-            for paragraph in data["paragraphs"]:
-                # The paragraph field is composed of lists representing paragraphs
-                print(paragraph, file=text_file)
-                # Blank line between paragraphs
-                print(file=text_file)
-                processed += 1
+                if max_per_file:
+                    paragraph = paragraph[: max_per_file - processed]
+                    processed += len(paragraph)
+                text_file.writelines(sentence + "\n" for sentence in paragraph)
                 if max_per_file and processed >= max_per_file:
                     return
+                # Blank line between paragraphs
+                text_file.write("\n")
+        elif units == UNIT_PARAGRAPHS:
+            paragraphs = data["paragraphs"]
+            if max_per_file:
+                paragraphs = paragraphs[:max_per_file]
+            # The paragraph field is composed of lists representing paragraphs.
+            # Blank line between paragraphs.
+            text_file.writelines(paragraph + "\n\n" for paragraph in paragraphs)
         else:
             raise ValueError(f"Unknown unit {units}, valid values are {VALID_UNITS}")
 
 
 def _parse_types(types: str, source: Path) -> List[str]:
-    subdirs = [filename.name for filename in Path(source).iterdir()]
+    with os.scandir(source) as entries:
+        subdirs = [entry.name for entry in entries]
     if not types:
         # If types is left blank, we take all subdirectories of source
         content_types = subdirs
@@ -350,7 +407,10 @@ def _parse_types(types: str, source: Path) -> List[str]:
 
 
 def _list_files(directory: Path) -> List[Path]:
-    return [entry for entry in directory.iterdir() if entry.is_file()]
+    # scandir entries know their file type from the directory listing, so this doesn't
+    # need a stat call per entry
+    with os.scandir(directory) as entries:
+        return [Path(entry.path) for entry in entries if entry.is_file()]
 
 
 if __name__ == "__main__":
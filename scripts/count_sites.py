@@ -13,7 +13,7 @@ from typing import Sequence, Tuple
 from lxml import etree, objectify
 from lxml.etree import XMLSyntaxError
 
-from extraction.downloadsitemaps import sanitize_url
+from extraction.downloadsitemaps import open_sitemap, sanitize_url
 from extraction.scraper import Page, read_filemap, SitemapFile
 
 
@@ -43,7 +43,7 @@ def count_pages(
         writer = csv.DictWriter(tsv_file, fieldnames=header, dialect="excel-tab")
         writer.writeheader()
         for sitemap in sitemap_list:
-            with open(os.path.join(sitemap_dir, sitemap.filename), "rb") as site_file:
+            with open_sitemap(os.path.join(sitemap_dir, sitemap.filename)) as site_file:
                 try:
                     tree = etree.XML(site_file.read())
                 except XMLSyntaxError as e:
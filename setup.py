@@ -22,6 +22,7 @@ def setup_package() -> None:
         long_description=long_description,
         install_requires=[
             "click",
+            "orjson",
         ],
         entry_points="""
             [console_scripts]